@@ -1,7 +1,13 @@
 import sys
+import time
+import queue
+import signal
 import socket
+import asyncio
 import logging
 import threading
+import multiprocessing
+import multiprocessing.connection
 
 welcome_text = '''Welcome to my Polynomial Pretty Print service!
 
@@ -11,6 +17,12 @@ The polynomial is: 3x^5-2x^4+6.7x^3+x-0.3
 
 '''
 
+busy_text = 'Server busy, please try again later.\n'
+
+stream_limit = 16 * 1024 * 1024
+
+shutdown_timeout = 5 # seconds given to the clients in flight when shutting down
+
 def is_int(x):
     return int(x) == x
 
@@ -26,20 +38,35 @@ def welcome(fout):
 def bye(fout):
     try_write(fout, 'Bye!\n')
 
-def read_coeff(fin, fout):
+def prompt(fout):
+    # sends everything written so far along with the prompt, False if the client is gone
     try:
         fout.write('Input coefficients: ')
         fout.flush()
     except:
-        return None
+        return False
+
+    return True
 
+def read_line(fin):
     try:
-        data = fin.readline().strip()
-        assert data
+        return fin.readline().strip()
     except:
+        return ''
+
+def read_coeff(fin, fout):
+    if not prompt(fout):
+        return None
+
+    data = read_line(fin)
+
+    if not data:
         bye(fout)
         return None
 
+    return parse_coeff(data, fout)
+
+def parse_coeff(data, fout):
     try:
         coeffs = [float(_) for _ in data.split(' ') if _]
         lc = len(coeffs)
@@ -54,15 +81,13 @@ def read_coeff(fin, fout):
 
     return [(int(c) if is_int(c) else c) for c in coeffs]
 
-def pretty_print(coeffs, fout):
-    try_write(fout, 'The polynomial is: ')
-
+def format_poly(coeffs):
     degree = len(coeffs) - 1
     first_done = False
+    terms = []
 
     if degree == 0:
-        try_write(fout, str(coeffs[0]) + '\n')
-        return
+        return 'The polynomial is: ' + str(coeffs[0]) + '\n'
 
     for coeff in coeffs:
         if coeff == 0:
@@ -84,65 +109,341 @@ def pretty_print(coeffs, fout):
         else:
             exp = ''
 
-        try_write(fout, sign + value + exp)
+        terms.append(sign + value + exp)
 
         first_done = True
         degree -= 1
 
-    try_write(fout, '\n')
+    return 'The polynomial is: ' + ''.join(terms) + '\n'
+
+def pretty_print(coeffs, fout):
+    # one write for the whole line, however many terms there are
+    try_write(fout, format_poly(coeffs))
+
+def answer(data, fout, session=False):
+    # writes the reply to one input line, and returns whether the client may send
+    # another one
+    if not data:
+        bye(fout)
+        return False
+
+    coeffs = parse_coeff(data, fout)
 
-def serve(fin, fout):
+    if coeffs:
+        pretty_print(coeffs, fout)
+
+    if not session:
+        if coeffs:
+            bye(fout)
+
+        return False
+
+    return True
+
+def serve(fin, fout, session=False):
+    # With session, answers one coefficient line after another until an empty
+    # line or EOF; the answer goes out along with the next prompt.
     welcome(fout)
 
-    coeffs = read_coeff(fin, fout)
+    while prompt(fout):
+        if not answer(read_line(fin), fout, session):
+            return
 
-    if not coeffs:
-        return
+def serve_session(fin, fout):
+    serve(fin, fout, session=True)
+
+def serve_console(session=False):
+    serve(sys.stdin, sys.stdout, session)
 
-    pretty_print(coeffs, fout)
+class StreamWriterFile:
+    # buffered text file interface over an asyncio.StreamWriter, each flush is a
+    # single write to the transport; draining is up to the caller
+    def __init__(self, writer):
+        self.writer = writer
+        self.buffer = []
 
-    bye(fout)
+    def write(self, content):
+        self.buffer.append(content)
 
-def serve_console():
-    serve(sys.stdin, sys.stdout)
+    def flush(self):
+        if self.buffer:
+            self.writer.write(''.join(self.buffer).encode())
+            self.buffer.clear()
 
-def handle_client(conn, clientaddr):
+async def serve_stream(reader, writer, timeout, session=False):
+    # serve() over asyncio streams
+    fout = StreamWriterFile(writer)
+    welcome(fout)
+
+    while prompt(fout):
+        try:
+            await asyncio.wait_for(writer.drain(), timeout)
+        except:
+            return
+
+        try:
+            data = (await asyncio.wait_for(reader.readline(), timeout)).decode().strip()
+        except:
+            data = ''
+
+        if not answer(data, fout, session):
+            fout.flush()
+            return
+
+def handle_client(conn, clientaddr, session=False):
     try:
         with conn.makefile('r') as fin, conn.makefile('w') as fout:
-            serve(fin, fout)
+            serve(fin, fout, session)
     except:
         logging.exception('Some error happened.')
     finally:
         conn.close()
         logging.info('Connection from %s closed.', clientaddr)
 
-def serve_socket(port, addr=None, use_ipv6=False):
+def reject_client(conn, clientaddr):
+    # tells a client over the connection limit to come back later, without waiting on it
+    logging.warning('Connection from %s rejected, server busy.', clientaddr)
+
+    try:
+        conn.setblocking(False)
+        conn.send(busy_text.encode())
+    except:
+        pass
+    finally:
+        conn.close()
+
+def worker(connections, slots, session):
+    while True:
+        conn, clientaddr = connections.get()
+
+        try:
+            handle_client(conn, clientaddr, session)
+        finally:
+            slots.release()
+
+async def handle_client_async(reader, writer, timeout=60, nodelay=True, session=False):
+    clientaddr = writer.get_extra_info('peername')
+    logging.info('Connection from %s accepted.', clientaddr)
+    writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, nodelay)
+
+    try:
+        await serve_stream(reader, writer, timeout, session)
+        await asyncio.wait_for(writer.drain(), timeout)
+    except:
+        logging.exception('Some error happened.')
+    finally:
+        writer.close()
+        logging.info('Connection from %s closed.', clientaddr)
+
+async def serve_asyncio(addr, port, family, backlog, max_connections, nodelay, session, reuse_port):
+    clients = set() # tasks of the clients in flight
+
+    async def handle(reader, writer):
+        if max_connections is not None and len(clients) >= max_connections:
+            logging.warning('Connection from %s rejected, server busy.', writer.get_extra_info('peername'))
+            writer.write(busy_text.encode())
+            writer.close()
+            return
+
+        task = asyncio.current_task()
+        clients.add(task)
+
+        try:
+            await handle_client_async(reader, writer, nodelay=nodelay, session=session)
+        finally:
+            clients.discard(task)
+
+    # lines as long as the blocking readline accepts, e.g. 65537 coefficients
+    server = await asyncio.start_server(handle, addr, port, family=family, backlog=backlog, limit=stream_limit,
+                                        reuse_port=reuse_port)
+    loop = asyncio.get_running_loop()
+
+    try:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # stop here, instead of raising KeyboardInterrupt in whichever client happens to be running
+            loop.add_signal_handler(signum, asyncio.current_task().cancel)
+    except (NotImplementedError, RuntimeError, ValueError): # not on Windows, nor outside the main thread
+        pass
+
+    try:
+        await loop.create_future() # serve until cancelled
+    except asyncio.CancelledError:
+        # Server.wait_closed() and serve_forever() would wait for every client to
+        # disconnect, so the clients are cancelled instead
+        server.close()
+
+        for task in clients:
+            task.cancel()
+
+        if clients:
+            await asyncio.wait(clients, timeout=shutdown_timeout)
+
+        raise KeyboardInterrupt from None
+
+def serve_forever(addr, port, family, engine, workers, max_connections, backlog, nodelay, session,
+                  reuse_port=False):
+    if engine == 'asyncio':
+        asyncio.run(serve_asyncio(addr, port, family, backlog, max_connections, nodelay, session, reuse_port))
+        return
+
+    s = socket.socket(family, socket.SOCK_STREAM)
+
+    if reuse_port:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    s.bind((addr, port))
+    s.listen(backlog)
+    s.settimeout(1) # a signal handled by another thread does not interrupt accept()
+
+    connections = queue.Queue()
+    slots = threading.BoundedSemaphore(max_connections)
+
+    for _ in range(workers):
+        thread = threading.Thread(target=worker, args=(connections, slots, session))
+        thread.daemon = True
+        thread.start()
+
+    try:
+        while True:
+            try:
+                conn, clientaddr = s.accept()
+            except socket.timeout:
+                continue
+
+            if not slots.acquire(blocking=False):
+                reject_client(conn, clientaddr)
+                continue
+
+            conn.settimeout(60)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, nodelay)
+            logging.info('Connection from %s accepted.', clientaddr)
+            connections.put((conn, clientaddr))
+    except KeyboardInterrupt:
+        # stop accepting, and let the worker threads finish the clients in flight
+        # (and the queued ones) by taking back every slot
+        s.close()
+        deadline = time.monotonic() + shutdown_timeout
+
+        for _ in range(max_connections):
+            if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                logging.warning('Clients still connected after %d seconds, dropping them.', shutdown_timeout)
+                break
+
+        raise
+
+def interrupt(signum, frame):
+    # SIGTERM shuts the server down the same way as Ctrl+C
+    raise KeyboardInterrupt
+
+def serve_process(*args):
     logging.basicConfig(format='%(asctime)s [%(levelname)s]: %(message)s', level=logging.INFO)
+    stopping = False
+
+    def stop(signum, frame):
+        # a worker gets SIGINT from Ctrl+C and SIGTERM from the supervisor, only
+        # the first one starts the shutdown
+        nonlocal stopping
+
+        if not stopping:
+            stopping = True
+            raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        serve_forever(*args, reuse_port=True)
+    except KeyboardInterrupt: # the supervisor shuts the server down
+        pass
+
+def supervise(processes, args):
+    # keeps processes worker processes serving on the same port, restarting the
+    # ones that exit, and stops them all when interrupted
+    pool = []
+
+    try:
+        while True:
+            for i in range(processes):
+                if i < len(pool) and pool[i].is_alive():
+                    continue
+
+                if i < len(pool):
+                    logging.error('Worker process %d exited with code %s, restarting...', pool[i].pid, pool[i].exitcode)
+                    time.sleep(1) # do not spin when workers keep crashing
+
+                process = multiprocessing.Process(target=serve_process, args=args, daemon=True)
+                process.start()
+                logging.info('Worker process %d started.', process.pid)
+
+                if i < len(pool):
+                    pool[i] = process
+                else:
+                    pool.append(process)
+
+            multiprocessing.connection.wait([process.sentinel for process in pool])
+    finally:
+        for process in pool:
+            if process.is_alive():
+                process.terminate() # the workers finish their clients, then exit
+
+        deadline = time.monotonic() + shutdown_timeout + 1
+
+        for process in pool:
+            process.join(max(deadline - time.monotonic(), 0))
+
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+def serve_socket(port, addr=None, use_ipv6=False, engine='thread', workers=32, max_connections=None, backlog=128,
+                 processes=1, nodelay=True, session=False):
+    # At most max_connections clients are served at once, by a pool of workers
+    # threads with the other accepted clients waiting in a queue; clients over the
+    # limit are told that the server is busy. The asyncio engine has no threads,
+    # and no limit unless max_connections is given; the thread engine defaults
+    # to 64.
+    # With several processes, each of them serves the port that way through
+    # SO_REUSEPORT, so the kernel spreads connections over them. Responses go out in
+    # one write per protocol step, so TCP_NODELAY (nodelay) costs no extra packets.
+    # With session, a client may send many coefficient lines over one connection.
+    # On Ctrl+C or SIGTERM, the thread engine stops accepting and gives the
+    # clients in flight shutdown_timeout seconds to finish, while the asyncio
+    # engine cancels them and closes their connections.
+    if engine not in ('thread', 'asyncio'):
+        raise ValueError('unknown engine %r' % (engine,))
+
+    if workers <= 0 or (max_connections is not None and max_connections <= 0) or backlog <= 0 or processes <= 0:
+        raise ValueError('workers, max connections, backlog and processes should be positive')
+
+    if max_connections is None and engine == 'thread':
+        max_connections = 64
+
+    if processes > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        raise ValueError('multiple processes need SO_REUSEPORT')
+
+    logging.basicConfig(format='%(asctime)s [%(levelname)s]: %(message)s', level=logging.INFO)
+
+    if threading.current_thread() is threading.main_thread(): # signals only reach the main thread
+        signal.signal(signal.SIGTERM, interrupt)
 
     try:
         if use_ipv6:
             addr = addr or '::'
             logging.info('Serving on [%s]:%d', addr, port)
-            s = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            family = socket.AF_INET6
         else:
             addr = addr or '0.0.0.0'
             logging.info('Serving on %s:%d', addr, port)
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            family = socket.AF_INET
 
-        s.bind((addr, port))
-        s.listen()
-
-        while True:
-            conn, clientaddr = s.accept()
-            conn.settimeout(60)
-            logging.info('Connection from %s accepted.', clientaddr)
-
-            thread = threading.Thread(target=handle_client, args=(conn, clientaddr))
-            thread.setDaemon(True)
-            thread.start()
+        args = (addr, port, family, engine, workers, max_connections, backlog, nodelay, session)
 
+        if processes > 1:
+            supervise(processes, args)
+        else:
+            serve_forever(*args)
     except KeyboardInterrupt:
-        logging.critical('Ctrl+C received, shutting down server...')
+        logging.critical('Ctrl+C or SIGTERM received, shutting down server...')
         sys.exit(0)
     except:
         logging.exception('Some error happened.')
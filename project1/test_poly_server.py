@@ -0,0 +1,160 @@
+import time
+import socket
+import asyncio
+import unittest
+from io import StringIO
+import poly
+
+
+class Writer:
+    def __init__(self):
+        self.data = bytearray()
+        self.writes = 0
+
+    def write(self, data):
+        self.data += data
+        self.writes += 1
+
+    async def drain(self):
+        pass
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestPoly(unittest.TestCase):
+    prompt = 'Input coefficients: '
+
+    def serve(self, data, session=False):
+        fout = StringIO()
+        poly.serve(StringIO(data), fout, session)
+        return fout.getvalue()
+
+    async def serve_stream(self, data, session=False):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data.encode())
+        reader.feed_eof()
+        writer = Writer()
+        await poly.serve_stream(reader, writer, 1, session)
+        return writer
+
+    def test_format_poly(self):
+        self.assertEqual(poly.format_poly([3, -2, 6.7, 0, 1, -0.3]), 'The polynomial is: 3x^5-2x^4+6.7x^3+x-0.3\n')
+        self.assertEqual(poly.format_poly([-1, 0, 1]), 'The polynomial is: -x^2+1\n')
+        self.assertEqual(poly.format_poly([0]), 'The polynomial is: 0\n')
+
+    def test_serve(self):
+        self.assertEqual(self.serve('1 2 3\n'), poly.welcome_text + self.prompt + 'The polynomial is: x^2+2x+3\nBye!\n')
+        self.assertEqual(self.serve('1 2 3\n4\n'), self.serve('1 2 3\n'))
+        self.assertEqual(self.serve(''), poly.welcome_text + self.prompt + 'Bye!\n')
+        self.assertEqual(self.serve('\n'), self.serve(''))
+
+        output = self.serve('1 a\n')
+        self.assertIn('Invalid coefficient list', output)
+        self.assertFalse(output.endswith('Bye!\n'))
+
+        self.assertIn('cannot be zero', self.serve('0 1\n'))
+
+    def test_session(self):
+        # an empty line or EOF ends the session, an invalid line keeps it open
+        output = self.serve('1 2\n1 a\n0 1\n3\n\n4\n', session=True)
+        self.assertEqual(output.count(self.prompt), 5)
+        self.assertIn('The polynomial is: x+2\n', output)
+        self.assertIn('Invalid coefficient list', output)
+        self.assertIn('cannot be zero', output)
+        self.assertIn('The polynomial is: 3\n', output)
+        self.assertNotIn('The polynomial is: 4\n', output)
+        self.assertTrue(output.endswith(self.prompt + 'Bye!\n'))
+        self.assertEqual(output.count('Bye!'), 1)
+
+        self.assertEqual(self.serve('1 2\n', session=True), self.serve('1 2\n\n', session=True))
+
+        fout = StringIO()
+        poly.serve_session(StringIO('1 2\n1 a\n'), fout)
+        self.assertEqual(fout.getvalue(), self.serve('1 2\n1 a\n', session=True))
+
+    def test_serve_stream(self):
+        async def run():
+            for data in ('1 2 3\n', '1 2 3', '1 a\n', '0 1\n', '', '\n', ' 3 -2 6.7 0 1 -0.3 \n4\n'):
+                for session in (False, True):
+                    writer = await self.serve_stream(data, session)
+                    self.assertEqual(writer.data.decode(), self.serve(data, session))
+
+            # one write per protocol step
+            writer = await self.serve_stream('1 2\n3\n\n', session=True)
+            self.assertEqual(writer.writes, 4)
+
+        asyncio.run(run())
+
+    def test_handle_client(self):
+        for session in (False, True):
+            server, client = socket.socketpair()
+            client.sendall(b'1 2\n\n1 a\n')
+            client.shutdown(socket.SHUT_WR)
+            poly.handle_client(server, 'test', session)
+            self.assertEqual(client.makefile('r').read(), self.serve('1 2\n\n1 a\n', session))
+            client.close()
+
+    def test_reject_client(self):
+        server, client = socket.socketpair()
+        poly.reject_client(server, 'test')
+        self.assertEqual(client.makefile('r').read(), poly.busy_text)
+        client.close()
+
+    def test_serve_asyncio(self):
+        port = free_port()
+        results = {}
+
+        async def connect():
+            for _ in range(100):
+                try:
+                    return await asyncio.open_connection('127.0.0.1', port)
+                except OSError:
+                    await asyncio.sleep(0.01)
+
+            raise OSError('server not listening')
+
+        async def clients(server):
+            try:
+                reader, writer = await connect()
+                greeting = await reader.readuntil(self.prompt.encode())
+
+                # over max_connections
+                busy_reader, busy_writer = await connect()
+                results['busy'] = await busy_reader.read()
+                busy_writer.close()
+
+                writer.write(b'3 -2 6.7 0 1 -0.3\n')
+                results['served'] = greeting + await reader.read()
+                writer.close()
+
+                # an idle client does not hold the shutdown
+                reader, results['idle'] = await connect()
+                await reader.readuntil(self.prompt.encode())
+                results['stopped'] = time.monotonic()
+            finally:
+                server.cancel()
+
+        async def main():
+            task = asyncio.ensure_future(clients(asyncio.current_task()))
+
+            try:
+                await poly.serve_asyncio('127.0.0.1', port, socket.AF_INET, 8, 1, True, False, False)
+            finally:
+                await task
+                results['idle'].close()
+
+        with self.assertLogs(level='INFO') as logs, self.assertRaises(KeyboardInterrupt):
+            asyncio.run(main())
+
+        self.assertIn('server busy', '\n'.join(logs.output))
+        self.assertLess(time.monotonic() - results['stopped'], 1)
+        self.assertEqual(results['busy'], poly.busy_text.encode())
+        self.assertEqual(results['served'], self.serve('3 -2 6.7 0 1 -0.3\n').encode())
+
+
+if __name__ == '__main__':  # pragma: no branch
+    unittest.main()
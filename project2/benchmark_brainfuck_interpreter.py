@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from brainfuck_interpreter import BFMachine, _BACKENDS
+from test_brainfuck_interpreter import TestBFMachine
+
+assert sys.version_info[0] >= 3
+
+# prints the squares from 0 to 10000 (by Daniel B. Cristofani)
+code_squares = (
+    b'++++[>+++++<-]>[<+++++>-]+<+[>[>+>+<<-]++>>[<<+>>-]>>>[-]++>[-]+>>>+[[-]++++++>>>]<<<[[<++++++++<++>>-]+<.<[>----<-]<]'
+    b'<<[>>>>>[>>>[-]+++++++++<[>-<-]+++++++++>[-[<->-]+[<<<]]<[>+<-]>]<<-]<<-]'
+)
+
+# prints the primes below 100 by trial division
+code_trial_division = (
+    b'++>++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++[>+>++<<<'
+    b'[->>>>+>+<<<<<]>>>>>[-<<<<<+>>>>>]<--[<<<<[->>>>>>>>+<<<+<<<<<]>>>>>[-<<<<<+>>>>>]<<[->>>>>>>+<<<<<+<<]>>[-<<+'
+    b'>>]>>>[->+>-[>+>>]>[+[-<+>]>+>>]<<<<<<]>[-]>[-]>>[-]<<<<<<+>>>>>[<<<<<[-]>>>>>[-]]<<<<<[<<<<[-]>>>>[-]]<<<+>-]'
+    b'<[-]<[<<[->>>>>>>>>>>>>>>>+<<<<<<<<<<<+<<<<<]>>>>>[-<<<<<+>>>>>]>>>>>>>>>>>>>++++++++++<<[->+>-[>+>>]>[+[-<+>]'
+    b'>+>>]<<<<<<]>[-]>[-]>>[->>>>+<<<<]>>>>>>++++++++++<<[->+>-[>+>>]>[+[-<+>]>+>>]<<<<<<]>[-]>[-]>[->>>>>>>>>+<<<<'
+    b'<<<<<<<<<<<<<<<<<<<<<<<<<<<+>>>>>>>>>>>>>>>>>>>>>>]<<<<<<<<<<<<<<<<<<<<<<[->>>>>>>>>>>>>>>>>>>>>>+<<<<<<<<<<<<'
+    b'<<<<<<<<<<]>>>>>>>>>>>>>>>>>>>>>>>[->>>>>>>>+<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<+>>>>>>>>>>>>>>>>>>>>>>>]<<<<<<<<<'
+    b'<<<<<<<<<<<<<<[->>>>>>>>>>>>>>>>>>>>>>>+<<<<<<<<<<<<<<<<<<<<<<<]>>>>>>>>>>>>>>>>>>>>>>>[++++++++++++++++++++++'
+    b'++++++++++++++++++++++++++.[-]]>>>>>>>>[<<<<<<<<<++++++++++++++++++++++++++++++++++++++++++++++++.>>>>>>>>>[-]'
+    b']<<<<<<<<<[-]<<<<<<<<++++++++++++++++++++++++++++++++++++++++++++++++.[-]<<<++++++++++.[-]<<<<<<<<<<<<<<[-]]<<'
+    b'+>-]'
+)
+
+# three nested loops of 16 iterations around a loop that is not turned into an idiom
+code_nested = b'++++++++++++++++[>++++++++++++++++[>++++++++++++++++[>>' + b'+' * 64 + b'[-->+<]>[-]<<<-]<-]<-]'
+
+PROGRAMS = {
+    'hello': TestBFMachine.code_hello,
+    'quine': TestBFMachine.code_quine,
+    'squares': code_squares,
+    'trial_division': code_trial_division,
+    'nested': code_nested,
+}
+
+
+def load_programs(directory):
+    # extra workloads such as mandelbrot.b, named after their file names
+    programs = {}
+
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.b'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                programs[name[:-2]] = f.read()
+
+    return programs
+
+
+def measure_compile(code, backend):
+    BFMachine.cache_clear()
+    start = time.perf_counter()
+    BFMachine(code, backend=backend).compile()
+    return time.perf_counter() - start
+
+
+def measure_peak_memory(machine):
+    tracemalloc.start()
+
+    try:
+        machine.run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(code, backend, repeat):
+    compile_time = measure_compile(code, backend)
+    machine = BFMachine(code, backend=backend)
+    machine.run() # warm up
+    wall_time = float('inf')
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        machine.run()
+        wall_time = min(wall_time, time.perf_counter() - start)
+
+    return {
+        'cycles': machine.cycles,
+        'wall_time': wall_time,
+        'cycles_per_sec': machine.cycles / wall_time if wall_time else None,
+        'peak_memory': measure_peak_memory(machine),
+        'compile_time': compile_time,
+    }
+
+
+def run_benchmarks(programs, backends, repeat):
+    results = {}
+
+    for name, code in programs.items():
+        for backend in backends:
+            print('%-16s %-12s ...' % (name, backend), end=' ', flush=True)
+            result = benchmark(code, backend, repeat)
+            results['%s/%s' % (name, backend)] = result
+            print('%.4fs  %.0f cycles/s  %d bytes peak  %.4fs compile' % (
+                result['wall_time'], result['cycles_per_sec'] or 0, result['peak_memory'], result['compile_time']))
+
+    return results
+
+
+def compare(old, new):
+    print()
+    print('%-24s %12s %12s %8s' % ('benchmark', 'old', 'new', 'speedup'))
+
+    for key, result in new.items():
+        if key not in old:
+            continue
+
+        old_time = old[key]['wall_time']
+        new_time = result['wall_time']
+        print('%-24s %11.4fs %11.4fs %7.2fx' % (key, old_time, new_time, old_time / new_time if new_time else float('inf')))
+
+        if old[key]['cycles'] != result['cycles']:
+            print('  cycle count changed: %d -> %d' % (old[key]['cycles'], result['cycles']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Brainfuck interpreter.')
+    parser.add_argument('names', nargs='*', help='programs to run (default: all)')
+    parser.add_argument('--backend', action='append', choices=_BACKENDS, help='backends to run (default: all)')
+    parser.add_argument('--programs', metavar='DIR', help='also run the .b files in DIR, e.g. mandelbrot.b')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark, the best one is kept')
+    parser.add_argument('--output', metavar='FILE', help='save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare against results saved by --output')
+    args = parser.parse_args()
+
+    programs = dict(PROGRAMS)
+
+    if args.programs:
+        programs.update(load_programs(args.programs))
+
+    if args.names:
+        unknown = set(args.names) - set(programs)
+
+        if unknown:
+            parser.error('unknown programs: %s' % ', '.join(sorted(unknown)))
+
+        programs = {name: programs[name] for name in args.names}
+
+    results = run_benchmarks(programs, args.backend or _BACKENDS, max(args.repeat, 1))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f)['results'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import functools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from brainfuck_interpreter import BFMachine
+
+assert sys.version_info[0] >= 3
+
+BatchResult = namedtuple('BatchResult', ['index', 'output', 'cycles', 'error'])
+
+# cycles run between two wall clock checks when a timeout is set
+_TIMEOUT_SLICE_CYCLES = 100000
+
+
+class TimeLimitExceeded(TimeoutError):
+    # a job ran past the wall clock timeout, as opposed to a TimeoutError raised
+    # by the machine itself when the cycle limit is exceeded
+    pass
+
+
+@functools.lru_cache(maxsize=256)
+def _get_machine(code, backend):
+    # machines stay warm in each worker process, so every program is compiled once per worker
+    return BFMachine(code, backend=backend)
+
+
+def _run_job(index, code, input_, cycle_limit, timeout, backend):
+    machine = None
+
+    try:
+        machine = _get_machine(code, backend)
+
+        if timeout is None:
+            output = machine.run(input_, cycle_limit=cycle_limit)
+        else:
+            deadline = time.monotonic() + timeout
+            chunks = []
+
+            for chunk in machine.run_iter(input_, cycle_limit=cycle_limit, slice_cycles=_TIMEOUT_SLICE_CYCLES):
+                chunks.append(chunk)
+
+                if machine.paused and time.monotonic() > deadline:
+                    raise TimeLimitExceeded('time limit exceeded')
+
+            output = b''.join(chunks)
+    except Exception as e:
+        return BatchResult(index, None, machine.cycles if machine is not None else 0, e)
+
+    return BatchResult(index, output, machine.cycles, None)
+
+
+def run_batch(jobs, *, workers=None, cycle_limit=None, timeout=None, backend='interpreter'):
+    # Runs (code, input) jobs on a pool of worker processes and yields a
+    # BatchResult for each of them as soon as it completes. index is the position
+    # of the job in jobs, and error holds the exception raised by the job, if any.
+    # A timeout needs the job to be paused and resumed in slices, which only the
+    # interpreter backend can do.
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if not isinstance(workers, int):
+        raise TypeError('workers should be an integer')
+
+    if workers <= 0:
+        raise ValueError('workers should be a positive integer')
+
+    if timeout is not None and timeout <= 0:
+        raise ValueError('timeout should be positive')
+
+    if timeout is not None and backend != 'interpreter':
+        raise ValueError('timeout is only supported by the interpreter backend')
+
+    jobs = enumerate(jobs)
+    max_pending = workers * 4 # do not materialize a huge job list up front
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        while True:
+            for index, (code, input_) in jobs:
+                pending.add(executor.submit(_run_job, index, code, input_, cycle_limit, timeout, backend))
+
+                if len(pending) >= max_pending:
+                    break
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                yield future.result()
+
+
+__all__ = ['BatchResult', 'TimeLimitExceeded', 'run_batch']
@@ -1,18 +1,822 @@
+import re
 import sys
+import json
+import time
+import struct
 import string
-from io import BytesIO
+import asyncio
+import bisect
+import hashlib
+import itertools
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 assert sys.version_info[0] >= 3
 
+# opcodes of the compiled intermediate representation
+_OP_ADD = 0
+_OP_MOVE = 1
+_OP_OUTPUT = 2
+_OP_INPUT = 3
+_OP_OPEN = 4
+_OP_CLOSE = 5
+_OP_HALT = 6
+_OP_CLEAR = 7
+_OP_MULTIPLY = 8
+_OP_SCAN = 9
+
+_FOLDABLE = {
+    ord('+'): (_OP_ADD, 1),
+    ord('-'): (_OP_ADD, -1),
+    ord('>'): (_OP_MOVE, 1),
+    ord('<'): (_OP_MOVE, -1),
+    ord('.'): (_OP_OUTPUT, 1), # the argument is the number of bytes written
+}
+
+_SIMPLE = {
+    ord(','): (_OP_INPUT, 1),
+    ord('!'): (_OP_HALT, 0),
+}
+
+_OPCODES = b'+-<>[].,!'
+
+_WHITESPACES = string.whitespace.encode()
+
+# translate table mapping opcodes to 1 and everything else to 0
+_OPCODE_MASK = bytes(c in _OPCODES for c in range(256))
+
+_COMMENT = re.compile(rb'#[^\n]*') # single line comment
+
+# The bytecode backend is experimental: dispatching through handler closures
+# runs about 1.5 to 2.5 times slower than the interpreter loop on CPython, so
+# it is never picked by default.
+_BACKENDS = ('interpreter', 'pycompile', 'bytecode')
+
+# array typecodes of cells wider than a byte
+_CELL_TYPECODES = {16: 'H', 32: 'I' if array('I').itemsize == 4 else 'L'}
+
+_OVERFLOW_MODES = ('wrap', 'error')
+
+_IDIOMS = (_OP_CLEAR, _OP_MULTIPLY, _OP_SCAN)
+
+_OP_NAMES = {
+    _OP_ADD: '+',
+    _OP_MOVE: '>',
+    _OP_OUTPUT: '.',
+    _OP_INPUT: ',',
+    _OP_OPEN: '[',
+    _OP_CLOSE: ']',
+    _OP_HALT: '!',
+    _OP_CLEAR: 'clear',
+    _OP_MULTIPLY: 'multiply',
+    _OP_SCAN: 'scan',
+}
+
+# magic, format version, flags, backend, cell bits, SHA-1 of the code, memory
+# size, memory limit, touched tape length, pointer, ip, pc, cycles, cycle limit,
+# lengths of the code, input and output sections, input offset, max output (if
+# flagged) and length of the output already written; wide cells are stored
+# little-endian
+_SNAPSHOT_HEADER = struct.Struct('<4sBBBB20s14Q')
+_SNAPSHOT_MAGIC = b'BFsn'
+_SNAPSHOT_VERSION = 4
+_SNAPSHOT_CODE = 1
+_SNAPSHOT_PAUSED = 2
+_SNAPSHOT_OVERFLOW_ERROR = 4
+_SNAPSHOT_MAX_OUTPUT = 8
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'maxbytes', 'currbytes'])
+
+
+class OutputLimitExceeded(OverflowError):
+    # a program wrote more than max_output bytes, as opposed to an OverflowError
+    # raised when a cell overflows with overflow='error'
+    pass
+
+
+class _Program:
+    # Each op is a tuple (opcode, argument, cost), where cost is the number of
+    # source opcodes it stands for. positions[i] is the source position of ops[i],
+    # and source_positions holds the position of every source opcode.
+    #
+    # Idiom ops (clear, multiply and scan loops) are placed right before the
+    # literal loop they replace. Their cost depends on the cell values, so it is
+    # computed at run time; when the whole loop does not fit in the cycle limit
+    # (or would raise), execution falls through to the literal loop instead.
+    def __init__(self, code):
+        self.code = code
+        self.ops = []
+        self.positions = []
+        self._python_functions = {} # cell mask -> generated function
+        self._bytecode = None
+        self._compile()
+        self._optimize()
+        self._measure_blocks()
+        self._measure_size()
+
+    def _strip(self):
+        # returns the code without whitespace and comments, and the source position
+        # of each of its opcodes; raises SyntaxError on any other character
+        code = self.code
+
+        if b'#' in code:
+            code = _COMMENT.sub(lambda m: b' ' * len(m.group()), code) # keeps the positions
+
+        stripped = code.translate(None, _WHITESPACES)
+        invalid = stripped.translate(None, _OPCODES)
+
+        if invalid:
+            pos = code.index(invalid[:1])
+            raise SyntaxError('invalid opcode %r at %s' % (invalid[:1], self._location(pos)))
+
+        if len(stripped) == len(code):
+            return stripped, range(len(code))
+
+        return stripped, list(itertools.compress(itertools.count(), code.translate(_OPCODE_MASK)))
+
+    def _location(self, pos):
+        line = self.code.count(b'\n', 0, pos) + 1
+        column = pos - self.code.rfind(b'\n', 0, pos)
+        return 'position %d (line %d, column %d)' % (pos, line, column)
+
+    def _compile(self):
+        code, source = self._strip()
+        self.source_positions = source
+        ops = self.ops
+        positions = self.positions
+        lbracks = []
+        last = None # source opcode folded into ops[-1]
+
+        for pos, opcode in enumerate(code):
+            if opcode in _FOLDABLE:
+                op, step = _FOLDABLE[opcode]
+
+                if opcode == last:
+                    _, arg, cost = ops[-1]
+                    ops[-1] = (op, arg + step, cost + 1)
+                else:
+                    ops.append((op, step, 1))
+                    positions.append(source[pos])
+                    last = opcode
+
+                continue
+
+            last = None
+
+            if opcode in _SIMPLE:
+                op, cost = _SIMPLE[opcode]
+                ops.append((op, None, cost))
+            elif opcode == ord('['):
+                lbracks.append(len(ops))
+                ops.append(None) # patched when the matching ']' is found
+            else:
+                if not lbracks:
+                    raise SyntaxError('no matching left bracket for right bracket at %s' % self._location(source[pos]))
+                index = lbracks.pop()
+                ops[index] = (_OP_OPEN, len(ops) + 1, 1)
+                ops.append((_OP_CLOSE, index + 1, 1))
+
+            positions.append(source[pos])
+
+        if lbracks:
+            raise SyntaxError('no matching right bracket for left bracket at %s' % self._location(positions[lbracks[-1]]))
+
+    def _optimize(self):
+        ops = []
+        positions = []
+        index_map = [] # index in self.ops -> index in ops
+
+        for index, op in enumerate(self.ops):
+            index_map.append(len(ops)) # jumps to a loop land on its idiom op
+
+            if op[0] == _OP_OPEN:
+                idiom = self._match_idiom(index)
+                if idiom is not None:
+                    ops.append(idiom)
+                    positions.append(self.positions[index])
+
+            ops.append(op)
+            positions.append(self.positions[index])
+
+        index_map.append(len(ops))
+
+        for index, (op, arg, cost) in enumerate(ops):
+            if op in (_OP_OPEN, _OP_CLOSE):
+                ops[index] = (op, index_map[arg], cost)
+            elif op in (_OP_CLEAR, _OP_MULTIPLY, _OP_SCAN):
+                ops[index] = (op, arg[:-1] + (index_map[arg[-1]],), cost)
+
+        self.ops = ops
+        self.positions = positions
+
+    def position(self, ip, unit=0):
+        # source position of the unit-th source opcode folded into ops[ip]
+        return self.source_positions[bisect.bisect_left(self.source_positions, self.positions[ip]) + unit]
+
+    def position_after(self, ip, units=0):
+        # position right after the last source opcode run before the first units
+        # source opcodes of ops[ip] (the end of the code if ip is past the last op)
+        if ip < len(self.ops):
+            index = bisect.bisect_left(self.source_positions, self.positions[ip]) + units
+        else:
+            index = len(self.source_positions)
+
+        return self.source_positions[index - 1] + 1 if index else 0
+
+    def _measure_blocks(self):
+        costs = [0] * (len(self.ops) + 1)
+
+        for index in reversed(range(len(self.ops))):
+            op, _, cost = self.ops[index]
+
+            if op in (_OP_ADD, _OP_MOVE):
+                costs[index] = cost + costs[index + 1]
+            elif op in (_OP_OPEN, _OP_CLOSE, _OP_OUTPUT, _OP_INPUT):
+                costs[index] = cost
+
+        self.block_costs = costs
+
+    def _measure_size(self):
+        # rough number of bytes held by the program, grown by python_function() and
+        # bytecode() as they compile it further; this is what the program cache counts
+        size = len(self.code) + sys.getsizeof(self.ops) + sys.getsizeof(self.positions)
+        size += sys.getsizeof(self.block_costs) + sys.getsizeof(self.source_positions)
+
+        for op in self.ops:
+            size += sys.getsizeof(op) + (sys.getsizeof(op[1]) if isinstance(op[1], tuple) else 0)
+
+        self.size = size
+
+    def _match_idiom(self, index):
+        end = self.ops[index][1] # index right after the matching ']'
+        body = self.ops[index + 1:end - 1]
+
+        if not body or any(op not in (_OP_ADD, _OP_MOVE) for op, _, _ in body):
+            return None
+
+        if len(body) == 1 and body[0][0] == _OP_MOVE: # [>] or [<]
+            return (_OP_SCAN, (body[0][1], end), 0)
+
+        offset = low = high = 0
+        body_cost = 0
+        changes = {}
+
+        for op, arg, cost in body:
+            body_cost += cost
+
+            if op == _OP_MOVE:
+                offset += arg
+                low = min(low, offset)
+                high = max(high, offset)
+            else:
+                change = changes.get(offset, 0)
+                if change and (change > 0) != (arg > 0): # keep every cell monotonic
+                    return None
+                changes[offset] = change + arg
+
+        step = changes.pop(0, 0)
+
+        if offset != 0 or step not in (1, -1):
+            return None
+
+        if not changes: # [-] or [+]
+            return (_OP_CLEAR, (step, body_cost, end), 0)
+
+        return (_OP_MULTIPLY, (step, body_cost, tuple(sorted(changes.items())), low, high, end), 0)
+
+    def generate_python(self, mask=0xff):
+        # Translates the program into the source of a Python function with one
+        # while loop per BF loop, for cells wrapping around with mask. Cycles are
+        # added per straight-line segment and compared with the limit only on loop
+        # back edges and exits.
+        lines = [
+            'def program(mem, mem_len, ptr, limit, getc, out, flush_at, flush, scan, grow, state):',
+            '    cycles = 0',
+            '    pc = %d' % len(self.code),
+            '    try:',
+        ]
+        indent = '        '
+        pending = 0 # cycles not yet added to the counter
+        ops = self.ops
+        positions = self.positions
+        ip = 0
+
+        def emit(*statements):
+            lines.extend(indent + statement for statement in statements)
+
+        def emit_cycles(cycles, prefix=''):
+            if cycles:
+                emit(prefix + 'cycles += %d' % cycles)
+
+        def emit_raise(pos, exception, message, done=None, fixes=()):
+            # done counts the source opcodes of the failing op that did succeed, and
+            # fixes are run once it is computed
+            if done is None:
+                emit_cycles(pending, '    ')
+            else:
+                emit('    cycles += %d + %s' % (pending, done))
+
+            emit(*('    ' + fix for fix in fixes))
+            emit('    pc = %d' % pos)
+
+            if exception != 'TimeoutError': # the limit may have been hit before the error
+                emit('    if cycles > limit:', "        raise TimeoutError('cycle limit exceeded')")
+
+            emit('    raise %s(%r)' % (exception, message))
+
+        def emit_reserve(index, pos, done=None, fallback=False): # makes mem[index] a touched cell
+            nonlocal indent
+            emit('if %s >= mem_len:' % index)
+            indent += '    '
+            emit('if %s >= len(mem) and not grow(%s + 1):' % (index, index))
+
+            if fallback:
+                emit_fallback()
+            else:
+                emit_raise(pos, 'MemoryError', 'memory limit exceeded', done, ('mem_len = len(mem)', 'ptr = mem_len - 1'))
+
+            emit('mem_len = %s + 1' % index)
+            indent = indent[:-4]
+
+        def emit_fallback():
+            # an idiom that cannot apply leaves the rest to the interpreter, which
+            # runs the literal loop up to its exact error
+            emit_cycles(pending, '    ')
+            emit('    return %d' % ip)
+
+        def emit_check(pos):
+            emit('if cycles > limit:')
+            emit_raise(pos, 'TimeoutError', 'cycle limit exceeded')
+
+        while ip < len(ops):
+            op, arg, cost = ops[ip]
+            pos = positions[ip]
+
+            if op == _OP_ADD:
+                emit('mem[ptr] = (mem[ptr]%s) & %#x' % (_signed(arg), mask))
+            elif op == _OP_MOVE:
+                emit('ptr %s= %d' % ('+' if arg > 0 else '-', abs(arg)))
+
+                if arg > 0: # only the moves up to the last cell succeed
+                    emit_reserve('ptr', pos, 'len(mem) - 1 - (ptr - %d)' % arg)
+                else: # only the moves down to cell 0 succeed
+                    emit('if ptr < 0:')
+                    emit_raise(pos, 'IndexError', 'memory index out of range', 'ptr + %d' % -arg, ('ptr = 0',))
+            elif op == _OP_OUTPUT:
+                value = 'mem[ptr]%s' % (' & 0xff' if mask != 0xff else '')
+                emit('out.append(%s)' % value if arg == 1 else 'out += bytes((%s,)) * %d' % (value, arg))
+                emit('if len(out) >= flush_at:')
+                indent += '    '
+                # the cycle limit takes precedence over the output limit, so a write
+                # past it is taken back and replayed by the interpreter
+                emit('if cycles > limit - %d:' % (pending + cost), '    del out[-%d:]' % arg)
+                emit_fallback()
+                # the state is exact while flush() may raise the output limit
+                emit('cycles += %d' % (pending + cost), 'pc = %d' % pos, 'flush_at = flush()')
+                emit('cycles -= %d' % (pending + cost), 'pc = %d' % len(self.code))
+                indent = indent[:-4]
+            elif op == _OP_INPUT:
+                emit('mem[ptr] = getc()')
+            elif op == _OP_OPEN:
+                emit_cycles(pending + cost)
+                emit('while mem[ptr]:')
+                indent += '    '
+                pending = 0
+                ip += 1
+                continue
+            elif op == _OP_CLOSE:
+                emit_cycles(pending + cost)
+                pending = 0
+                emit_check(pos)
+                indent = indent[:-4]
+                ip += 1
+                continue
+            elif op == _OP_HALT:
+                emit_cycles(pending)
+                pending = 0
+                emit_check(pos)
+                emit('pc = %d' % pos, 'return')
+            elif op == _OP_CLEAR:
+                step, body_cost, end = arg
+                emit('cycles += 1 + %s * %d' % (_loop_count(step, mask), body_cost + 1), 'mem[ptr] = 0')
+                ip = end
+                continue
+            elif op == _OP_MULTIPLY:
+                step, body_cost, changes, low, high, end = arg
+                emit('if mem[ptr]:', '    count = %s' % _loop_count(step, mask))
+                indent += '    '
+
+                if low < 0:
+                    emit('if ptr < %d:' % -low)
+                    emit_fallback()
+
+                if high > 0:
+                    emit_reserve('ptr + %d' % high, pos, fallback=True)
+
+                for offset, change in changes:
+                    cell = 'mem[ptr%s]' % _signed(offset)
+                    emit('%s = (%s + count * %d) & %#x' % (cell, cell, change, mask))
+
+                emit('mem[ptr] = 0', 'cycles += count * %d' % (body_cost + 1))
+                indent = indent[:-4]
+                emit('cycles += 1')
+                ip = end
+                continue
+            elif op == _OP_SCAN:
+                step, end = arg
+                emit('if mem[ptr]:', '    target = scan(mem, ptr, %d)' % step, '    if target is None:')
+                indent += '    '
+                emit_fallback()
+                emit_reserve('target', pos, fallback=True)
+                emit('cycles += abs(target - ptr) // %d * %d' % (abs(step), abs(step) + 1), 'ptr = target')
+                indent = indent[:-4]
+                emit('cycles += 1')
+                ip = end
+                continue
+
+            pending += cost
+            ip += 1
+
+        emit_cycles(pending)
+        emit_check(len(self.code))
+        lines.extend([
+            '    finally:',
+            '        state[:] = ptr, mem_len, cycles, pc',
+        ])
+
+        return '\n'.join(lines) + '\n'
+
+    def python_function(self, mask=0xff):
+        # the compiled generate_python() function, None if Python cannot compile it
+        if mask not in self._python_functions:
+            namespace = {}
+
+            try:
+                exec(compile(self.generate_python(mask), '<brainfuck>', 'exec'), namespace)
+            except (SyntaxError, RecursionError, MemoryError): # nested too deeply for Python
+                self._python_functions[mask] = None
+            else:
+                self._python_functions[mask] = namespace['program']
+                self.size += sys.getsizeof(namespace['program'].__code__.co_code)
+
+        return self._python_functions[mask]
+
+    def bytecode(self):
+        # ops as an array('i') of opcode/operand pairs, where jump operands are
+        # offsets in the array and idiom operands index a list of constants
+        if self._bytecode is None:
+            code = array('i')
+            constants = []
+
+            for op, arg, cost in self.ops:
+                if op in (_OP_OPEN, _OP_CLOSE):
+                    arg *= 2
+                elif op in _IDIOMS:
+                    constants.append(arg[:-1] + (arg[-1] * 2,))
+                    arg = len(constants) - 1
+                elif arg is None:
+                    arg = 0
+
+                code.extend((op, arg))
+
+            self._bytecode = code, constants
+            self.size += sys.getsizeof(code) + sys.getsizeof(constants)
+
+        return self._bytecode
+
+
+class _Fallback(Exception):
+    # raised by bytecode handlers when the interpreter has to take over
+    pass
+
+
+def _signed(value):
+    return ' %s %d' % ('+' if value > 0 else '-', abs(value))
+
+
+def _loop_count(step, mask):
+    # iterations of a loop whose counter cell changes by step each time
+    return 'mem[ptr]' if step == -1 else '(-mem[ptr] & %#x)' % mask
+
+
+class _ProgramCache:
+    # Process-wide LRU cache of compiled programs keyed by the SHA-1 hash of
+    # their code, bounded both in number of programs and in the total size of
+    # the compiled programs. Programs compiled further for another backend
+    # after being cached are counted again on the next insertion.
+    def __init__(self, maxsize=256, maxbytes=16 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self._programs = OrderedDict()
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code):
+        key = hashlib.sha1(code).digest()
+
+        with self._lock:
+            program = self._programs.get(key)
+
+            if program is not None and program.code == code:
+                self._programs.move_to_end(key)
+                self.hits += 1
+                return program
+
+            self.misses += 1
+
+        program = _Program(code) # compile outside of the lock
+
+        with self._lock:
+            if key not in self._programs:
+                self._programs[key] = program
+                self._evict()
+
+        return program
+
+    def _size(self):
+        return sum(program.size for program in self._programs.values())
+
+    def _evict(self):
+        size = self._size()
+
+        while self._programs and (len(self._programs) > self.maxsize or size > self.maxbytes):
+            _, program = self._programs.popitem(last=False)
+            size -= program.size
+
+    def configure(self, maxsize, maxbytes):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if maxbytes is not None:
+                self.maxbytes = maxbytes
+            self._evict()
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._programs), self.maxbytes, self._size())
+
+    def clear(self):
+        with self._lock:
+            self._programs.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_program_cache = _ProgramCache()
+
+InstructionStats = namedtuple('InstructionStats', ['position', 'opcode', 'executions', 'cycles', 'time'])
+
+LoopStats = namedtuple('LoopStats', ['start', 'end', 'depth', 'entries', 'iterations', 'cycles'])
+
+
+class BFProfile:
+    # Execution profile of one run: per instruction and per loop counts, sorted
+    # from the hottest, plus the time spent in I/O instructions versus the rest.
+    def __init__(self, program, executions, cycles, times):
+        ops = program.ops
+        positions = program.positions
+
+        self.cycles = sum(cycles)
+        self.time = sum(times)
+        self.io_time = sum(t for (op, _, _), t in zip(ops, times) if op in (_OP_INPUT, _OP_OUTPUT))
+        self.compute_time = self.time - self.io_time
+
+        self.instructions = []
+
+        for ip, (op, arg, cost) in enumerate(ops):
+            if executions[ip]:
+                if op in (_OP_ADD, _OP_MOVE):
+                    name = ('+-' if op == _OP_ADD else '><')[arg < 0] * abs(arg)
+                else:
+                    name = _OP_NAMES[op]
+
+                self.instructions.append(InstructionStats(positions[ip], name, executions[ip], cycles[ip], times[ip]))
+
+        self.instructions.sort(key=lambda stats: (-stats.cycles, stats.position))
+
+        inclusive = [0] # inclusive[ip] is the number of cycles spent in ops[:ip]
+        for count in cycles:
+            inclusive.append(inclusive[-1] + count)
+
+        self.loops = []
+        self._tree = {'name': 'program', 'value': self.cycles, 'children': []}
+        nodes = [(len(ops), self._tree)] # enclosing loops as (end ip, flame graph node)
+
+        for ip, (op, arg, cost) in enumerate(ops):
+            if op != _OP_OPEN:
+                continue
+
+            first = ip
+            entries = executions[ip]
+            iterations = executions[arg - 1] # every iteration ends with one ']'
+
+            if ip > 0 and ops[ip - 1][0] in _IDIOMS:
+                first = ip - 1
+                idiom, idiom_arg, _ = ops[first]
+                body_cost = abs(idiom_arg[0]) if idiom == _OP_SCAN else idiom_arg[1]
+                entries += executions[first]
+                iterations += (cycles[first] - executions[first]) // (body_cost + 1)
+
+            while nodes[-1][0] < arg:
+                nodes.pop()
+
+            stats = LoopStats(positions[ip], positions[arg - 1], len(nodes) - 1, entries, iterations,
+                              inclusive[arg] - inclusive[first])
+            self.loops.append(stats)
+
+            node = {'name': '[ at %d' % stats.start, 'value': stats.cycles, 'children': []}
+            if stats.cycles:
+                nodes[-1][1]['children'].append(node)
+            nodes.append((arg, node))
+
+        self.loops.sort(key=lambda stats: (-stats.cycles, stats.start))
+
+    def report(self, limit=20):
+        lines = [
+            'cycles: %d' % self.cycles,
+            'time: %.6fs (compute %.6fs, I/O %.6fs)' % (self.time, self.compute_time, self.io_time),
+            '',
+            'hot instructions:',
+            '%10s  %-12s  %12s  %14s  %7s' % ('position', 'opcode', 'executions', 'cycles', '%'),
+        ]
+
+        for stats in self.instructions[:limit]:
+            opcode = stats.opcode if len(stats.opcode) <= 12 else stats.opcode[:9] + '...'
+            lines.append('%10d  %-12s  %12d  %14d  %6.2f%%' % (stats.position, opcode, stats.executions,
+                                                               stats.cycles, self._percentage(stats.cycles)))
+
+        lines.extend([
+            '',
+            'hot loops:',
+            '%10s  %10s  %5s  %12s  %12s  %14s  %7s' % ('start', 'end', 'depth', 'entries', 'iterations', 'cycles', '%'),
+        ])
+
+        for stats in self.loops[:limit]:
+            lines.append('%10d  %10d  %5d  %12d  %12d  %14d  %6.2f%%' % (stats.start, stats.end, stats.depth,
+                         stats.entries, stats.iterations, stats.cycles, self._percentage(stats.cycles)))
+
+        return '\n'.join(lines) + '\n'
+
+    def _percentage(self, cycles):
+        return cycles * 100 / self.cycles if self.cycles else 0
+
+    def to_json(self, indent=None):
+        # nested loops as a d3-flame-graph tree, weighted by cycles
+        return json.dumps(self._tree, indent=indent)
+
+
+LoopAnalysis = namedtuple('LoopAnalysis', ['start', 'end', 'depth', 'pointer_delta', 'min_offset', 'max_offset',
+                                           'termination'])
+
+
+class _Region:
+    # pointer movement and cell writes of a piece of code, relative to the cell
+    # it starts on; ptr, low and high become None once the pointer is unknown
+    def __init__(self, ip):
+        self.ip = ip
+        self.ptr = 0
+        self.low = 0
+        self.high = 0
+        self.changes = {} # offset -> net change made by + and -
+        self.clobbered = set() # offsets of cells written otherwise
+        self.halts = False
+        self.terminates = True # every loop inside provably terminates
+
+
+class BFAnalysis:
+    # Static analysis of a program. min_offset and max_offset bound the cells the
+    # pointer can reach (None when a loop that moves the pointer makes it
+    # unknown), so memory_size cells are enough for any run. For each loop,
+    # pointer_delta is the pointer movement of one iteration and termination is
+    # 'terminates', 'infinite' (once entered) or 'unknown'.
+    def __init__(self, program):
+        ops = program.ops
+        positions = program.positions
+        regions = [_Region(0)]
+        self.loops = []
+
+        for ip, (op, arg, cost) in enumerate(ops):
+            region = regions[-1]
+
+            if op == _OP_OPEN:
+                regions.append(_Region(ip))
+            elif op == _OP_CLOSE:
+                body = regions.pop()
+                region = regions[-1]
+                termination = 'unknown'
+
+                # the counter cell is only changed by + and -, by the same amount each time
+                if body.ptr == 0 and not body.halts and 0 not in body.clobbered:
+                    step = body.changes.get(0, 0) & 0xff
+
+                    if step == 0:
+                        termination = 'infinite'
+                    elif step % 2 and body.terminates: # odd steps reach 0 within 256 iterations
+                        termination = 'terminates'
+
+                self.loops.append(LoopAnalysis(positions[body.ip], positions[ip], len(regions) - 1, body.ptr,
+                                               body.low, body.high, termination))
+                region.halts |= body.halts
+                region.terminates &= termination == 'terminates'
+
+                if region.ptr is None:
+                    pass
+                elif body.ptr == 0:
+                    base = region.ptr
+                    region.low = min(region.low, base + body.low)
+                    region.high = max(region.high, base + body.high)
+                    region.clobbered.add(base)
+                    region.clobbered.update(base + offset for offset in body.changes)
+                    region.clobbered.update(base + offset for offset in body.clobbered)
+                else:
+                    region.ptr = region.low = region.high = None
+            elif op == _OP_HALT:
+                region.halts = True
+            elif region.ptr is None or op in _IDIOMS:
+                pass
+            elif op == _OP_MOVE:
+                region.ptr += arg
+                region.low = min(region.low, region.ptr)
+                region.high = max(region.high, region.ptr)
+            elif op == _OP_ADD:
+                region.changes[region.ptr] = region.changes.get(region.ptr, 0) + arg
+            elif op == _OP_INPUT:
+                region.clobbered.add(region.ptr)
+
+        top = regions[0]
+        self.loops.sort(key=lambda loop: loop.start)
+        self.min_offset = top.low
+        self.max_offset = top.high
+        self.memory_size = top.high + 1 if top.high is not None else None
+        self.terminates = top.terminates
+
+
 class BFMachine:
-    def __init__(self, code=None):
+    def __init__(self, code=None, *, backend='interpreter', memory_size=None, memory_limit=None, cell_bits=8,
+                 overflow='wrap', max_output=None):
+        if backend not in _BACKENDS:
+            raise ValueError('unknown backend %r' % (backend,))
+
+        if cell_bits != 8 and cell_bits not in _CELL_TYPECODES:
+            raise ValueError('cell bits should be 8, 16 or 32')
+
+        if overflow not in _OVERFLOW_MODES:
+            raise ValueError('unknown overflow mode %r' % (overflow,))
+
+        if memory_limit is not None:
+            if not isinstance(memory_limit, int):
+                raise TypeError('memory limit should be an integer')
+
+            if memory_limit <= 0:
+                raise ValueError('memory limit should be a positive integer')
+
+        if max_output is not None:
+            if not isinstance(max_output, int):
+                raise TypeError('max output should be an integer')
+
+            if max_output < 0:
+                raise ValueError('max output should be a non-negative integer')
+
+        if memory_size is None:
+            memory_size = min(30000, memory_limit or 30000)
+
+        if not isinstance(memory_size, int):
+            raise TypeError('memory size should be an integer')
+
+        if memory_size <= 0:
+            raise ValueError('memory size should be a positive integer')
+
+        if memory_limit is not None and memory_limit < memory_size:
+            raise ValueError('memory limit should not be less than memory size')
+
+        self._backend = backend
+        self._memory_size = memory_size
+        self._memory_limit = memory_limit
+        self._max_output = max_output # bytes a run may write
+        self._cell_bits = cell_bits
+        self._cell_max = (1 << cell_bits) - 1
+        self._cell_mask = self._cell_max if overflow == 'wrap' else -1 # -1 lets the storage raise
+
         if code is not None:
             self.load_code(code)
         else:
             self._code = None
+            self._program = None
 
         self.reset_mem()
+        self._set_io(b'', None, float('inf'), None)
+        self._running = False
+        self._profile = None
+        self._cycle_limit = float('inf')
         self._cycles = 0
+        self._ip = 0
         self._pc = 0
 
     def load_code(self, code):
@@ -25,103 +829,652 @@ class BFMachine:
         if isinstance(code, str):
             code = code.encode()
 
+        self._program = _program_cache.get(code)
         self._code = code
 
+    def compile(self):
+        # builds what the backend runs up front, instead of on the first run
+        if self._code is None:
+            raise ValueError('code not loaded')
+
+        if self._cell_mask >= 0: # otherwise every backend runs on the interpreter
+            if self._backend == 'pycompile':
+                self._program.python_function(self._cell_mask)
+            elif self._backend == 'bytecode':
+                self._program.bytecode()
+
     def reset_mem(self):
-        self._mem = bytearray(1)
+        # cells beyond _mem_len are preallocated but not touched yet, and always zero
+        self._mem = self._new_tape(self._memory_size)
+        self._mem_len = 1
         self._mem_ptr = 0
 
-    def _inc_mem_ptr(self):
-        if self._mem_ptr + 1 >= len(self._mem):
-            self._mem.append(0)
+    def _new_tape(self, size):
+        if self._cell_bits == 8:
+            return bytearray(size)
 
-        self._mem_ptr += 1
+        return array(_CELL_TYPECODES[self._cell_bits], bytes(size * self._cell_bits // 8))
 
-    def _dec_mem_ptr(self):
-        if self._mem_ptr == 0:
-            raise IndexError('memory index out of range')
+    def _grow_mem(self, size):
+        # grows the tape geometrically to hold at least size cells, returns False
+        # if that would exceed the memory limit
+        capacity = max(size, 2 * len(self._mem))
 
-        self._mem_ptr -= 1
+        if self._memory_limit is not None:
+            capacity = min(capacity, self._memory_limit)
 
-    def _inc_mem(self):
-        self._mem[self._mem_ptr] = (self._mem[self._mem_ptr] + 1) % 256
+        if capacity > len(self._mem):
+            self._mem += self._new_tape(capacity - len(self._mem))
 
-    def _dec_mem(self):
-        self._mem[self._mem_ptr] = (self._mem[self._mem_ptr] - 1) % 256
+        return capacity >= size
 
-    def _output_byte(self):
-        self._fout.write(bytes([self._mem[self._mem_ptr]]))
+    @staticmethod
+    def _scan(mem, ptr, step):
+        # index of the first zero cell reached from ptr in steps of step, None if
+        # the scan would run off the left end of the tape
+        if isinstance(mem, bytearray):
+            if step == 1:
+                target = mem.find(0, ptr)
+                return target if target >= 0 else len(mem)
 
-    def _input_byte(self):
-        self._mem[self._mem_ptr] = ord(self._fin.read(1) or b'\x00') # return b'\x00' when EOF
+            if step == -1:
+                target = mem.rfind(0, 0, ptr + 1)
+                return target if target >= 0 else None
+        elif step == 1:
+            try:
+                return mem.index(0, ptr)
+            except ValueError:
+                return len(mem)
 
-    def _enter_loop(self):
-        if self._mem[self._mem_ptr] == 0:
-            num_lbracks = 1
-            pos = self._pc + 1
+        mem_len = len(mem)
+        while 0 <= ptr < mem_len and mem[ptr]:
+            ptr += step
 
-            while pos < self._code_len:
-                opcode = bytes([self._code[pos]])
+        return ptr if ptr >= 0 else None
 
-                if opcode == b'[':
-                    num_lbracks += 1
-                elif opcode == b']':
-                    num_lbracks -= 1
-                    if num_lbracks == 0:
-                        self._pc = pos + 1
-                        return
+    def _execute(self, pause_at=None, pause_on_output=False, pause_on_input=False):
+        # runs until the program ends, or pauses once pause_at cycles have been
+        # executed (or right after an output if pause_on_output is set, or right
+        # before an input that the input buffer cannot serve if pause_on_input is)
+        #
+        # Each straight-line run of ops is paid for when control enters it, so the
+        # ops themselves do no cycle accounting. When the budget left is smaller
+        # than the next run, or an op is about to fail, _execute_exact takes over.
+        ops = self._program.ops
+        block_costs = self._program.block_costs
+        positions = self._program.positions
+        num_ops = len(ops)
+        limit = self._cycle_limit
+        stop = min(limit, pause_at) if pause_at is not None else limit
+        mem = self._mem
+        mem_len = self._mem_len
+        ptr = self._mem_ptr
+        mask = self._cell_mask
+        outbuf = self._outbuf
+        flush_at = self._flush_size
+        cycles = self._cycles
+        ip = self._ip
+        paused = exact = False
 
-                pos += 1
+        if cycles + block_costs[ip] >= stop:
+            return self._execute_exact(pause_at, pause_on_output, pause_on_input)
 
-            raise SyntaxError('no matching right bracket for left bracket at position %d' % self._pc)
-        else:
-            self._pc += 1
+        cycles += block_costs[ip]
+
+        try:
+            while ip < num_ops:
+                op, arg, cost = ops[ip]
+
+                if op == _OP_ADD:
+                    mem[ptr] = (mem[ptr] + arg) & mask # the storage raises if mask is -1
+                    ip += 1
+                    continue
+                elif op == _OP_MOVE:
+                    ptr += arg
+
+                    if ptr >= mem_len:
+                        if ptr >= len(mem) and not self._grow_mem(ptr + 1):
+                            ptr -= arg
+                            cycles -= block_costs[ip]
+                            exact = True
+                            break
+
+                        mem_len = ptr + 1
+                    elif ptr < 0:
+                        ptr -= arg
+                        cycles -= block_costs[ip]
+                        exact = True
+                        break
+
+                    ip += 1
+                    continue
+                elif op == _OP_OPEN:
+                    ip = ip + 1 if mem[ptr] else arg
+                elif op == _OP_CLOSE:
+                    ip = arg if mem[ptr] else ip + 1
+                elif op == _OP_CLEAR or op == _OP_MULTIPLY or op == _OP_SCAN:
+                    state = self._run_idiom(op, arg, ptr, mem_len, cycles)
+
+                    if state is not None:
+                        ptr, mem_len, cycles, ip = state
+                    else:
+                        ip += 1
+                elif op == _OP_OUTPUT:
+                    if arg == 1:
+                        outbuf.append(mem[ptr] & 0xff)
+                    else:
+                        outbuf += bytes((mem[ptr] & 0xff,)) * arg
+
+                    if len(outbuf) >= flush_at:
+                        flush_at = self._flush_output()
+
+                    ip += 1
+
+                    if pause_on_output:
+                        paused = True
+                        break
+                elif op == _OP_INPUT:
+                    if pause_on_input and self._inpos >= len(self._inbuf):
+                        cycles -= cost
+                        paused = True
+                        break
+
+                    mem[ptr] = self._getc()
+                    ip += 1
+                elif op == _OP_HALT:
+                    break
+
+                # control enters a new run of ops here
+                cost = block_costs[ip]
+                if cycles + cost >= stop:
+                    exact = True
+                    break
+
+                cycles += cost
+        except (ValueError, OverflowError):
+            if op != _OP_ADD or mask >= 0:
+                raise
+
+            cycles -= block_costs[ip] # the overflowing add is replayed exactly
+            exact = True
+        finally:
+            self._running = paused or exact
+            self._ip = ip
+            self._mem_len = mem_len
+            self._mem_ptr = ptr
+            self._cycles = cycles
+            self._pc = positions[ip] if ip < num_ops else len(self._code)
+
+        if exact:
+            self._execute_exact(pause_at, pause_on_output, pause_on_input)
+
+    def _execute_exact(self, pause_at=None, pause_on_output=False, pause_on_input=False):
+        # same as _execute, checking the cycle budget before every op; on errors pc
+        # is set the way a plain opcode by opcode interpreter would leave it
+        program = self._program
+        ops = program.ops
+        positions = program.positions
+        num_ops = len(ops)
+        limit = self._cycle_limit
+        pause_at = pause_at if pause_at is not None else float('inf')
+        stop = min(limit, pause_at)
+        mem = self._mem
+        mem_len = self._mem_len
+        ptr = self._mem_ptr
+        mask = self._cell_mask
+        outbuf = self._outbuf
+        flush_at = self._flush_size
+        cycles = self._cycles
+        ip = self._ip
+        paused = False
+        pc = None
+
+        try:
+            while ip < num_ops:
+                op, arg, cost = ops[ip]
+
+                if cycles + cost >= stop:
+                    if cycles > limit:
+                        if pc is None:
+                            pc = program.position_after(ip)
+                        raise TimeoutError('cycle limit exceeded')
+
+                    if cycles >= pause_at:
+                        paused = True
+                        break
+
+                    # execute only the part of a folded run that fits in the limit
+                    units = limit - cycles + 1
+                    if units < cost:
+                        arg = units if arg > 0 else -units
+                        cost = units
+                        pc = program.position_after(ip, units) # the limit is exceeded right after it
+
+                cycles += cost
+
+                if op == _OP_ADD:
+                    mem[ptr] = (mem[ptr] + arg) & mask # the storage raises if mask is -1
+                elif op == _OP_MOVE:
+                    ptr += arg
+
+                    if ptr >= mem_len:
+                        if ptr >= len(mem) and not self._grow_mem(ptr + 1):
+                            moved = len(mem) - 1 - (ptr - arg) # only the moves up to the last cell succeed
+                            cycles += moved - cost
+                            pc = program.position(ip, moved)
+                            mem_len = len(mem)
+                            ptr = mem_len - 1
+                            raise MemoryError('memory limit exceeded')
+
+                        mem_len = ptr + 1
+                    elif ptr < 0:
+                        moved = ptr - arg # only the moves down to cell 0 succeed
+                        cycles += moved - cost
+                        pc = program.position(ip, moved)
+                        ptr = 0
+                        raise IndexError('memory index out of range')
+                elif op == _OP_OPEN:
+                    if not mem[ptr]:
+                        ip = arg
+                        continue
+                elif op == _OP_CLOSE:
+                    if mem[ptr]:
+                        ip = arg
+                        continue
+                elif op == _OP_CLEAR or op == _OP_MULTIPLY or op == _OP_SCAN:
+                    state = self._run_idiom(op, arg, ptr, mem_len, cycles)
+
+                    if state is not None:
+                        ptr, mem_len, cycles, ip = state
+                        continue
+                elif op == _OP_OUTPUT:
+                    if arg == 1:
+                        outbuf.append(mem[ptr] & 0xff)
+                    else:
+                        outbuf += bytes((mem[ptr] & 0xff,)) * arg
+
+                    if len(outbuf) >= flush_at:
+                        flush_at = self._flush_output()
+
+                    if pause_on_output:
+                        ip += 1
+                        paused = True
+                        break
+                elif op == _OP_INPUT:
+                    if pause_on_input and self._inpos >= len(self._inbuf):
+                        cycles -= cost
+                        paused = True
+                        break
+
+                    mem[ptr] = self._getc()
+                elif op == _OP_HALT:
+                    break
+
+                ip += 1
+
+            if cycles > limit:
+                if pc is None:
+                    pc = program.position_after(ip)
+                raise TimeoutError('cycle limit exceeded')
+        except (ValueError, OverflowError):
+            if op != _OP_ADD or mask >= 0:
+                raise
+
+            # the cell stops at its bound, only the steps up to it succeed
+            value = mem[ptr]
+            mem[ptr] = self._cell_max if arg > 0 else 0
+            added = self._cell_max - value if arg > 0 else value
+            cycles += added - cost
+            pc = program.position(ip, added)
+            raise OverflowError('cell overflow') from None
+        finally:
+            self._running = paused
+            self._ip = ip
+            self._mem_len = mem_len
+            self._mem_ptr = ptr
+            self._cycles = cycles
+
+            if pc is not None:
+                self._pc = pc
+            else:
+                self._pc = positions[ip] if ip < num_ops else len(self._code)
 
-    def _exit_loop(self):
-        if self._mem[self._mem_ptr] != 0:
-            num_rbracks = 1
-            pos = self._pc - 1
+    def _run_idiom(self, op, arg, ptr, mem_len, cycles):
+        # runs the loop an idiom op stands for at once, returning the new ptr,
+        # mem_len, cycles and the end of the loop, or None if the literal loop has
+        # to run instead (it would overflow a cell, leave the tape or hit the limit)
+        mem = self._mem
+        mask = self._cell_mask
 
-            while pos >= 0:
-                opcode = bytes([self._code[pos]])
+        if op == _OP_SCAN:
+            step, end = arg
+            target = self._scan(mem, ptr, step)
 
-                if opcode == b']':
-                    num_rbracks += 1
-                elif opcode == b'[':
-                    num_rbracks -= 1
-                    if num_rbracks == 0:
-                        self._pc = pos + 1
-                        return
+            if target is None:
+                return None
 
-                pos -= 1
+            cycles += 1 + (target - ptr) // step * (abs(step) + 1)
 
-            raise SyntaxError('no matching left bracket for right bracket at position %d' % self._pc)
+            if cycles > self._cycle_limit or (target >= len(mem) and not self._grow_mem(target + 1)):
+                return None
+
+            return target, max(mem_len, target + 1), cycles, end
+
+        if op == _OP_CLEAR:
+            step, body_cost, end = arg
+            changes = ()
+            low = high = 0
         else:
-            self._pc += 1
+            step, body_cost, changes, low, high, end = arg
 
-    def _skip_whitespaces(self):
-        while self._pc < self._code_len:
-            if bytes([self._code[self._pc]]) not in string.whitespace.encode():
-                break
-            self._pc += 1
+        value = mem[ptr]
+        count = (-step * value) & mask # negative if the loop would overflow
+        cycles += 1 + count * (body_cost + 1)
 
-    def _skip_comment(self):
-        while self._pc < self._code_len: # single line comment
-            if bytes([self._code[self._pc]]) == b'\n':
-                self._pc += 1
-                break
-            self._pc += 1
+        if count < 0 or cycles > self._cycle_limit:
+            return None
 
-    def run(self, input_=b'', *, reset_mem=True, cycle_limit=None):
-        if not isinstance(input_, (str, bytes)):
-            raise TypeError('input should be str or bytes')
+        if value:
+            if ptr + low < 0 or (ptr + high >= len(mem) and not self._grow_mem(ptr + high + 1)):
+                return None
 
-        if isinstance(input_, str):
-            input_ = input_.encode()
+            if mask < 0 and not self._fits(mem, ptr, changes, count):
+                return None
 
-        if self._code is None:
-            raise ValueError('code not loaded')
+            mem_len = max(mem_len, ptr + high + 1)
+
+            for offset, change in changes:
+                mem[ptr + offset] = (mem[ptr + offset] + count * change) & mask
+
+            mem[ptr] = 0
+
+        return ptr, mem_len, cycles, end
+
+    def _fits(self, mem, ptr, changes, count):
+        # whether a multiplication loop leaves every cell in range
+        return all(0 <= mem[ptr + offset] + count * change <= self._cell_max for offset, change in changes)
+
+    def _execute_pycompiled(self):
+        # the generated code only tracks pc and cycles per block, so after an error
+        # they can be past the opcode that raised it
+        function = self._program.python_function(self._cell_mask) if self._cell_mask >= 0 else None
+
+        if function is None: # overflow errors are only raised exactly by the interpreter
+            return self._execute()
+
+        state = [self._mem_ptr, self._mem_len, 0, 0]
+
+        try:
+            ip = function(self._mem, self._mem_len, self._mem_ptr, self._cycle_limit, self._getc, self._outbuf,
+                          self._flush_size, self._flush_output, self._scan, self._grow_mem, state)
+        finally:
+            self._running = False
+            self._ip = len(self._program.ops)
+            self._mem_ptr, self._mem_len, self._cycles, self._pc = state
+
+        if ip is not None: # an idiom about to fail, see generate_python
+            self._running = True
+            self._ip = ip
+            self._execute()
+
+    def _execute_bytecode(self):
+        # Dispatches through a list of handler closures indexed by opcode, with the
+        # machine state in closure cells. Handlers return the offset of the next
+        # pair; the rare cases needing exact semantics (the cycle limit about to be
+        # hit, tape errors and halting) are handed over to _execute from the op at
+        # hand. Experimental, see _BACKENDS.
+        if self._cell_mask < 0:
+            return self._execute()
+
+        code, constants = self._program.bytecode()
+        end = len(code)
+        mem = self._mem
+        mem_len = self._mem_len
+        ptr = self._mem_ptr
+        mask = self._cell_mask
+        limit = self._cycle_limit
+        outbuf = self._outbuf
+        flush_at = self._flush_size
+        flush = self._flush_output
+        getc = self._getc
+        grow = self._grow_mem
+        run_idiom = self._run_idiom
+        cycles = self._cycles
+
+        def add(arg, pc):
+            nonlocal cycles
+            cost = arg if arg > 0 else -arg
+
+            if cycles + cost >= limit:
+                raise _Fallback
+
+            cycles += cost
+            mem[ptr] = (mem[ptr] + arg) & mask
+            return pc + 2
+
+        def move(arg, pc):
+            nonlocal cycles, ptr, mem_len
+            cost = arg if arg > 0 else -arg
+            target = ptr + arg
+
+            if cycles + cost >= limit or target < 0:
+                raise _Fallback
+
+            if target >= mem_len:
+                if target >= len(mem) and not grow(target + 1):
+                    raise _Fallback
+
+                mem_len = target + 1
+
+            cycles += cost
+            ptr = target
+            return pc + 2
+
+        def output(arg, pc):
+            nonlocal cycles, flush_at
+
+            if cycles + arg >= limit:
+                raise _Fallback
+
+            cycles += arg
+
+            if arg == 1:
+                outbuf.append(mem[ptr] & 0xff)
+            else:
+                outbuf.extend(bytes((mem[ptr] & 0xff,)) * arg)
+
+            if len(outbuf) >= flush_at:
+                flush_at = flush()
+
+            return pc + 2
+
+        def input_(arg, pc):
+            nonlocal cycles
+
+            if cycles + 1 >= limit:
+                raise _Fallback
+
+            cycles += 1
+            mem[ptr] = getc()
+            return pc + 2
+
+        def open_(arg, pc):
+            nonlocal cycles
+
+            if cycles + 1 >= limit:
+                raise _Fallback
+
+            cycles += 1
+            return pc + 2 if mem[ptr] else arg
+
+        def close(arg, pc):
+            nonlocal cycles
+
+            if cycles + 1 >= limit:
+                raise _Fallback
+
+            cycles += 1
+            return arg if mem[ptr] else pc + 2
+
+        def halt(arg, pc):
+            raise _Fallback
+
+        # idiom handlers fall through to the literal loop when they cannot apply
+        def idiom(arg, pc):
+            nonlocal cycles, ptr, mem_len
+            state = run_idiom(code[pc], constants[arg], ptr, mem_len, cycles)
+
+            if state is None:
+                return pc + 2
+
+            ptr, mem_len, cycles, pc = state
+            return pc
+
+        handlers = [None] * (max(_OP_NAMES) + 1)
+        handlers[_OP_ADD] = add
+        handlers[_OP_MOVE] = move
+        handlers[_OP_OUTPUT] = output
+        handlers[_OP_INPUT] = input_
+        handlers[_OP_OPEN] = open_
+        handlers[_OP_CLOSE] = close
+        handlers[_OP_HALT] = halt
+        handlers[_OP_CLEAR] = idiom
+        handlers[_OP_MULTIPLY] = idiom
+        handlers[_OP_SCAN] = idiom
 
+        pc = self._ip * 2
+        fallback = False
+
+        try:
+            while pc < end:
+                pc = handlers[code[pc]](code[pc + 1], pc)
+        except _Fallback:
+            fallback = True
+        finally:
+            self._ip = pc // 2
+            self._mem_len = mem_len
+            self._mem_ptr = ptr
+            self._cycles = cycles
+
+            if not fallback:
+                self._running = False
+                self._pc = self._program.positions[self._ip] if pc < end else len(self._code)
+
+        if fallback:
+            self._execute()
+
+    def _execute_profiled(self):
+        # steps through the program one op at a time, so that the hot loop of
+        # _execute stays free of profiling code
+        program = self._program
+        executions = [0] * len(program.ops)
+        cycles = [0] * len(program.ops)
+        times = [0.0] * len(program.ops)
+
+        try:
+            while self._running:
+                ip = self._ip
+                before = self._cycles
+                start_time = time.perf_counter()
+
+                try:
+                    self._execute_exact(before + 1)
+                finally:
+                    if ip < len(program.ops): # otherwise only the end of the program was reached
+                        times[ip] += time.perf_counter() - start_time
+                        cycles[ip] += self._cycles - before
+
+                        if self._cycles > before or program.ops[ip][0] not in _IDIOMS: # not a fall through
+                            executions[ip] += 1
+        finally:
+            self._profile = BFProfile(program, executions, cycles, times)
+
+    def _getc(self):
+        if self._inpos >= len(self._inbuf):
+            self._inbuf = self._read_input()
+            self._inpos = 0
+
+            if not self._inbuf:
+                return 0 # return 0 when EOF
+
+        self._inpos += 1
+        return self._inbuf[self._inpos - 1]
+
+    def _read_input(self):
+        # about to block for more input, so let the output produced so far out first
+        self._flush_output()
+
+        while self._refill is not None:
+            data = self._refill()
+
+            if data is None:
+                self._refill = None
+            elif data:
+                return bytes(data)
+
+        return b''
+
+    def _set_io(self, inbuf, refill, buffer_size, sink, outlen=0):
+        self._inbuf = inbuf
+        self._inpos = 0
+        self._refill = refill
+        self._outbuf = bytearray()
+        self._outlen = outlen # output already taken out of the buffer
+        self._buffer_size = buffer_size
+        self._sink = sink
+        self._set_flush_size()
+
+    def _set_flush_size(self):
+        # the output buffer is flushed once full, or once it takes the output past
+        # max_output
+        self._flush_size = self._buffer_size
+
+        if self._max_output is not None:
+            self._flush_size = min(self._flush_size, self._max_output - self._outlen + 1)
+
+    def _set_state(self, mem, mem_ptr, ip, pc, cycles, cycle_limit, inbuf, inpos, outlen=0):
+        # loads a paused run whose touched cells are mem, in native byte order, with
+        # in-memory input and outlen bytes already written
+        data = memoryview(mem).cast('B')
+        mem_len = len(data) * 8 // self._cell_bits
+        self._mem = self._new_tape(max(self._memory_size, mem_len))
+        memoryview(self._mem).cast('B')[:len(data)] = data
+        self._mem_len = mem_len
+        self._mem_ptr = mem_ptr
+        self._set_io(inbuf, None, float('inf'), None, outlen)
+        self._inpos = inpos
+        self._running = True
+        self._cycle_limit = cycle_limit
+        self._cycles = cycles
+        self._ip = ip
+        self._pc = pc
+
+    def _flush_output(self):
+        # hands the buffered output over to the sink and returns the new flush
+        # size; output past max_output is dropped
+        excess = self._max_output is not None and self._outlen + len(self._outbuf) > self._max_output
+
+        if excess:
+            del self._outbuf[self._max_output - self._outlen:]
+
+        if self._sink is not None and self._outbuf:
+            self._sink(bytes(self._outbuf))
+            self._take_output()
+
+        if excess:
+            raise OutputLimitExceeded('output limit exceeded')
+
+        return self._flush_size
+
+    def _take_output(self):
+        output = bytes(self._outbuf)
+        self._outbuf.clear()
+        self._outlen += len(output)
+        self._set_flush_size()
+        return output
+
+    @staticmethod
+    def _check_cycle_limit(cycle_limit):
         if cycle_limit is not None:
             if not isinstance(cycle_limit, int):
                 raise TypeError('cycle limit should be an integer')
@@ -129,57 +1482,452 @@ class BFMachine:
             if cycle_limit <= 0:
                 raise ValueError('cycle limit should be a positive integer')
 
-        self._fin = BytesIO(input_)
-        self._fout = BytesIO()
+    def _prepare_run(self, reset_mem, cycle_limit):
+        if self._code is None:
+            raise ValueError('code not loaded')
+
+        self._check_cycle_limit(cycle_limit)
+        self._cycle_limit = cycle_limit if cycle_limit is not None else float('inf')
+        self._running = True
+        self._ip = 0
         self._pc = 0
-        self._code_len = len(self._code)
         self._cycles = 0
 
         if reset_mem:
             self.reset_mem()
 
-        while self._pc < self._code_len:
-            opcode = bytes([self._code[self._pc]])
-
-            if opcode == b'>':
-                self._inc_mem_ptr()
-                self._pc += 1
-            elif opcode == b'<':
-                self._dec_mem_ptr()
-                self._pc += 1
-            elif opcode == b'+':
-                self._inc_mem()
-                self._pc += 1
-            elif opcode == b'-':
-                self._dec_mem()
-                self._pc += 1
-            elif opcode == b'.':
-                self._output_byte()
-                self._pc += 1
-            elif opcode == b',':
-                self._input_byte()
-                self._pc += 1
-            elif opcode == b'[':
-                self._enter_loop()
-            elif opcode == b']':
-                self._exit_loop()
-            elif opcode == b'!': # halt program
-                break
-            elif opcode in string.whitespace.encode():
-                self._skip_whitespaces()
+    def _dispatch(self, profile):
+        self._profile = None
+
+        if profile:
+            self._execute_profiled()
+        elif self._backend == 'pycompile':
+            self._execute_pycompiled()
+        elif self._backend == 'bytecode':
+            self._execute_bytecode()
+        else:
+            self._execute()
+
+    def run(self, input_=b'', *, reset_mem=True, cycle_limit=None, profile=False):
+        self.start(input_, reset_mem=reset_mem, cycle_limit=cycle_limit)
+        self._dispatch(profile)
+
+        return bytes(self._outbuf)
+
+    def start(self, input_=b'', *, reset_mem=True, cycle_limit=None):
+        # sets up a run that is then executed in slices by resume()
+        if not isinstance(input_, (str, bytes)):
+            raise TypeError('input should be str or bytes')
+
+        if isinstance(input_, str):
+            input_ = input_.encode()
+
+        self._prepare_run(reset_mem, cycle_limit)
+        self._set_io(input_, None, float('inf'), None)
+
+    def resume(self, cycles=None, *, pause_on_output=False):
+        # continues the paused run for about the given number of cycles (until the
+        # program ends if None), returns the output produced meanwhile
+        if not self.paused:
+            raise ValueError('no paused run to resume')
+
+        if cycles is not None:
+            if not isinstance(cycles, int):
+                raise TypeError('cycles should be an integer')
+
+            if cycles <= 0:
+                raise ValueError('cycles should be a positive integer')
+
+        self._execute(self._cycles + cycles if cycles is not None else None, pause_on_output)
+
+        return self._take_output()
+
+    def run_iter(self, input_=b'', *, reset_mem=True, cycle_limit=None, slice_cycles=None, pause_on_output=False):
+        # generator version of run() yielding the output of every slice
+        self.start(input_, reset_mem=reset_mem, cycle_limit=cycle_limit)
+
+        while self.paused:
+            yield self.resume(slice_cycles, pause_on_output=pause_on_output)
+
+    def run_stream(self, fin, fout, *, reset_mem=True, cycle_limit=None, buffer_size=8192, profile=False):
+        # fin is a readable binary file object or an iterable of bytes chunks (None
+        # for no input at all), fout is a writable binary file object
+        if not isinstance(buffer_size, int):
+            raise TypeError('buffer size should be an integer')
+
+        if buffer_size <= 0:
+            raise ValueError('buffer size should be a positive integer')
+
+        if fin is None:
+            refill = None
+        elif hasattr(fin, 'read'):
+            read = getattr(fin, 'read1', fin.read) # do not wait for a full buffer on pipes
+            refill = lambda: read(buffer_size) or None
+        else:
+            try:
+                chunks = iter(fin)
+            except TypeError:
+                raise TypeError('input should be a readable file object or an iterable of bytes') from None
+            refill = lambda: next(chunks, None)
+
+        if not hasattr(fout, 'write'):
+            raise TypeError('output should be a writable file object')
+
+        self._prepare_run(reset_mem, cycle_limit)
+        self._set_io(b'', refill, buffer_size, fout.write)
+
+        try:
+            self._dispatch(profile)
+        finally:
+            self._flush_output()
+
+            if hasattr(fout, 'flush'):
+                fout.flush()
+
+    async def arun(self, reader, writer, *, reset_mem=True, cycle_limit=None, slice_cycles=10000, buffer_size=8192):
+        # Runs the program as a coroutine, reading input from the asyncio.StreamReader
+        # reader (None for no input at all) and writing output to the
+        # asyncio.StreamWriter writer. Control goes back to the event loop after
+        # every slice of slice_cycles cycles, and while waiting for input or for the
+        # writer to drain.
+        for name, value in (('slice cycles', slice_cycles), ('buffer size', buffer_size)):
+            if not isinstance(value, int):
+                raise TypeError('%s should be an integer' % name)
+
+            if value <= 0:
+                raise ValueError('%s should be a positive integer' % name)
+
+        self._prepare_run(reset_mem, cycle_limit)
+        self._set_io(b'', None, float('inf'), None)
+        eof = reader is None
+
+        try:
+            while self._running:
+                self._execute(self._cycles + slice_cycles, pause_on_input=not eof)
+
+                if self._outbuf:
+                    writer.write(self._take_output())
+                    await writer.drain()
+
+                if self._running and not eof and self._inpos >= len(self._inbuf) and \
+                        self._program.ops[self._ip][0] == _OP_INPUT: # starved for input
+                    data = await reader.read(buffer_size)
+
+                    if data:
+                        self._inbuf = data
+                        self._inpos = 0
+                    else:
+                        eof = True
+                else:
+                    await asyncio.sleep(0)
+        finally:
+            if self._outbuf: # output produced before an error
+                writer.write(self._take_output())
+
+    def run_many(self, inputs, *, cycle_limit=None, return_exceptions=False):
+        # runs the program on a fresh tape for each input and returns the outputs in
+        # order; with return_exceptions, a failed run gives its exception instead of
+        # raising it. The state of this machine is left untouched.
+        if self._code is None:
+            raise ValueError('code not loaded')
+
+        self._check_cycle_limit(cycle_limit)
+        inputs = list(inputs)
+
+        for index, input_ in enumerate(inputs):
+            if not isinstance(input_, (str, bytes)):
+                raise TypeError('input should be str or bytes')
+
+            if isinstance(input_, str):
+                inputs[index] = input_.encode()
+
+        scalar = BFMachine(self._code, memory_size=self._memory_size, memory_limit=self._memory_limit,
+                           cell_bits=self._cell_bits, overflow=self.overflow, max_output=self._max_output)
+        results = [None] * len(inputs)
+
+        def finish(index, function, *args, **kwargs):
+            try:
+                results[index] = function(*args, **kwargs)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+
+        if numpy is None or len(inputs) < 2 or self._cell_mask < 0: # overflow errors need the exact interpreter
+            for index, input_ in enumerate(inputs):
+                finish(index, scalar.run, input_, cycle_limit=cycle_limit)
+        else:
+            self._run_lockstep(scalar, inputs, cycle_limit if cycle_limit is not None else float('inf'), finish)
+
+        return results
+
+    def _run_lockstep(self, scalar, inputs, limit, finish):
+        # All lanes share ip, ptr and the number of I/O operations, and only differ
+        # in their cells and in the cycles spent in idioms. A lane leaves for the
+        # scalar interpreter when a branch goes another way than for most lanes, or
+        # when it gets close to the cycle limit or an error, which the interpreter
+        # handles exactly. Lanes that left keep their rows in the matrices until at
+        # least half of the rows are gone, and the tape columns grow on demand.
+        ops = self._program.ops
+        positions = self._program.positions
+        num_ops = len(ops)
+        memory_limit = self._memory_limit
+        max_output = self._max_output
+        mask = self._cell_mask
+        dtype = {8: numpy.uint8, 16: numpy.uint16, 32: numpy.uint32}[self._cell_bits]
+        lanes = numpy.arange(len(inputs)) # input of each row of the matrices
+        rows = slice(None) # rows of the lanes still running
+        active = len(inputs)
+        mem = numpy.zeros((len(inputs), min(self._memory_size, 64)), dtype)
+        inmat = numpy.zeros((len(inputs), max(map(len, inputs)) + 1), numpy.uint8) # EOF reads 0
+        outmat = numpy.zeros((len(inputs), 64), numpy.uint8)
+        extra = numpy.zeros(len(inputs), numpy.int64) # cycles spent in idioms
+        touched = numpy.ones(len(inputs), numpy.int64) # cells touched by multiplications
+        max_extra = 0
+        mem_len = 1
+        ptr = 0
+        ip = 0
+        base = 0 # cycles spent outside idioms, the same for all lanes
+        inpos = 0
+        outpos = 0
+
+        for row, input_ in zip(inmat, inputs):
+            row[:len(input_)] = numpy.frombuffer(input_, numpy.uint8)
+
+        def resume_scalar(prefix):
+            scalar._execute()
+            return prefix + bytes(scalar._outbuf)
+
+        def split(leaving):
+            # leaving is a mask over the running lanes
+            nonlocal lanes, rows, active, mem, inmat, extra, touched, max_extra
+            running = numpy.arange(len(lanes))[rows]
+
+            for i in running[leaving]:
+                lane = int(lanes[i])
+                input_ = inputs[lane]
+                scalar._set_state(mem[i, :max(mem_len, int(touched[i]))].tobytes(), ptr, ip, positions[ip],
+                                  base + int(extra[i]), limit, input_, min(inpos, len(input_)), outpos)
+                finish(lane, resume_scalar, outmat[lane, :outpos].tobytes())
+
+            running = running[~leaving]
+            active = len(running)
+
+            if 2 * active <= len(lanes):
+                lanes = lanes[running]
+                mem = mem[running]
+                inmat = inmat[running]
+                extra = extra[running]
+                touched = touched[running]
+                rows = slice(None)
+            else:
+                rows = running
+
+            max_extra = int(extra[rows].max()) if active else 0
+
+        def grow(size):
+            nonlocal mem
+            capacity = max(size, 2 * mem.shape[1])
+
+            if memory_limit is not None:
+                capacity = min(capacity, memory_limit)
+
+            if capacity > mem.shape[1]:
+                mem = numpy.concatenate((mem, numpy.zeros((len(mem), capacity - mem.shape[1]), dtype)), axis=1)
+
+            return capacity >= size
+
+        while ip < num_ops and active:
+            op, arg, cost = ops[ip]
+
+            if base + max_extra + cost >= limit:
+                split(base + extra[rows] + cost >= limit)
                 continue
-            elif opcode == b'#':
-                self._skip_comment()
+
+            if op == _OP_ADD:
+                mem[rows, ptr] += arg & mask
+            elif op == _OP_MOVE:
+                target = ptr + arg
+
+                if target < 0 or (target >= mem.shape[1] and not grow(target + 1)):
+                    split(numpy.ones(active, bool))
+                    continue
+
+                ptr = target
+                mem_len = max(mem_len, ptr + 1)
+            elif op == _OP_OPEN or op == _OP_CLOSE:
+                nonzero = mem[rows, ptr] != 0
+                taken = int(numpy.count_nonzero(nonzero))
+
+                if 0 < taken < active:
+                    split(~nonzero if 2 * taken >= active else nonzero)
+                    continue
+
+                if bool(taken) == (op == _OP_CLOSE):
+                    base += cost
+                    ip = arg
+                    continue
+            elif op == _OP_CLEAR or op == _OP_MULTIPLY:
+                step, body_cost = arg[:2]
+                value = mem[rows, ptr].astype(numpy.int64)
+                count = (-step * value) & mask
+                costs = 1 + count * (body_cost + 1)
+                unfit = base + extra[rows] + costs > limit # falls through to the literal loop
+
+                if op == _OP_MULTIPLY:
+                    _, _, changes, low, high, end = arg
+                    moving = value != 0
+
+                    if moving.any() and (ptr + low < 0 or (ptr + high >= mem.shape[1] and not grow(ptr + high + 1))):
+                        unfit |= moving
+                else:
+                    end = arg[2]
+
+                if unfit.any():
+                    split(unfit)
+                    continue
+
+                if op == _OP_MULTIPLY and moving.any():
+                    for offset, change in changes:
+                        mem[rows, ptr + offset] += ((count * change) & mask).astype(dtype)
+
+                    touched[rows] = numpy.where(moving, numpy.maximum(touched[rows], ptr + high + 1), touched[rows])
+
+                mem[rows, ptr] = 0
+                extra[rows] += costs
+                max_extra = int(extra[rows].max())
+                ip = end
                 continue
-            else:
-                raise SyntaxError('invalid opcode %r at position %d' % (opcode, self._pc))
+            elif op == _OP_SCAN:
+                pass # the literal loop follows, and splits lanes where it diverges
+            elif op == _OP_OUTPUT:
+                if max_output is not None and outpos + arg > max_output:
+                    split(numpy.ones(active, bool))
+                    continue
 
-            self._cycles += 1
+                while outpos + arg > outmat.shape[1]:
+                    outmat = numpy.concatenate((outmat, numpy.zeros_like(outmat)), axis=1)
 
-            if cycle_limit is not None and self._cycles > cycle_limit:
-                raise TimeoutError('cycle limit exceeded')
+                outmat[lanes[rows], outpos:outpos + arg] = (mem[rows, ptr] & 0xff)[:, None]
+                outpos += arg
+            elif op == _OP_INPUT:
+                mem[rows, ptr] = inmat[rows, inpos] if inpos < inmat.shape[1] else 0
+                inpos += 1
+            elif op == _OP_HALT:
+                break
+
+            base += cost
+            ip += 1
+
+        for lane in lanes[rows]:
+            finish(int(lane), outmat[lane, :outpos].tobytes)
+
+    def snapshot(self, *, include_code=True):
+        # complete state of the machine as bytes, which restore() turns back into a
+        # machine, possibly in another process; without the code only its hash is
+        # stored and restore() has to be given the code
+        if self._code is None:
+            raise ValueError('code not loaded')
+
+        code = self._code if include_code else b''
+        inbuf = self._inbuf if isinstance(self._inbuf, bytes) else bytes(self._inbuf)
+        tape = memoryview(self._mem)[:self._mem_len]
+        flags = ((_SNAPSHOT_CODE if include_code else 0) | (_SNAPSHOT_PAUSED if self._running else 0) |
+                 (_SNAPSHOT_OVERFLOW_ERROR if self._cell_mask < 0 else 0) |
+                 (_SNAPSHOT_MAX_OUTPUT if self._max_output is not None else 0))
+
+        if self._cell_bits > 8 and sys.byteorder == 'big':
+            tape = self._mem[:self._mem_len]
+            tape.byteswap()
+
+        header = _SNAPSHOT_HEADER.pack(
+            _SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, flags, _BACKENDS.index(self._backend), self._cell_bits,
+            hashlib.sha1(self._code).digest(), self._memory_size, self._memory_limit or 0,
+            self._mem_len, self._mem_ptr, self._ip, self._pc, self._cycles,
+            self._cycle_limit if self._cycle_limit != float('inf') else 0,
+            len(code), len(inbuf), len(self._outbuf), self._inpos, self._max_output or 0, self._outlen)
+
+        return b''.join((header, code, tape, inbuf, self._outbuf))
+
+    @classmethod
+    def restore(cls, snapshot, code=None):
+        try:
+            snapshot = memoryview(snapshot).cast('B')
+        except TypeError:
+            raise TypeError('snapshot should be a bytes-like object') from None
+
+        if len(snapshot) < _SNAPSHOT_HEADER.size:
+            raise ValueError('invalid snapshot')
+
+        (magic, version, flags, backend, cell_bits, digest, memory_size, memory_limit, mem_len, mem_ptr, ip, pc,
+         cycles, cycle_limit, code_len, input_len, output_len, inpos, max_output,
+         outlen) = _SNAPSHOT_HEADER.unpack_from(snapshot)
+
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError('invalid snapshot')
+
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError('unsupported snapshot version %d' % version)
+
+        if backend >= len(_BACKENDS) or (cell_bits != 8 and cell_bits not in _CELL_TYPECODES):
+            raise ValueError('invalid snapshot')
+
+        offset = _SNAPSHOT_HEADER.size
+        sections = []
+
+        for size in (code_len, mem_len * cell_bits // 8, input_len, output_len):
+            sections.append(snapshot[offset:offset + size])
+            offset += size
 
-        return self._fout.getvalue()
+        if offset != len(snapshot):
+            raise ValueError('invalid snapshot')
+
+        if flags & _SNAPSHOT_CODE:
+            code = bytes(sections[0])
+        elif code is None:
+            raise ValueError('snapshot does not include the code')
+        elif isinstance(code, str):
+            code = code.encode()
+
+        if hashlib.sha1(code).digest() != digest:
+            raise ValueError('code does not match the snapshot')
+
+        machine = cls(code, backend=_BACKENDS[backend], memory_size=memory_size, memory_limit=memory_limit or None,
+                      cell_bits=cell_bits, overflow='error' if flags & _SNAPSHOT_OVERFLOW_ERROR else 'wrap',
+                      max_output=max_output if flags & _SNAPSHOT_MAX_OUTPUT else None)
+        tape = sections[1]
+
+        if cell_bits > 8 and sys.byteorder == 'big':
+            tape = array(_CELL_TYPECODES[cell_bits], bytes(tape))
+            tape.byteswap()
+
+        if not 0 <= mem_ptr < mem_len or (memory_limit and mem_len > memory_limit) or \
+                ip > len(machine._program.ops) or inpos > input_len:
+            raise ValueError('invalid snapshot')
+
+        machine._set_state(tape, mem_ptr, ip, pc, cycles, cycle_limit or float('inf'), bytes(sections[2]), inpos,
+                           outlen)
+        machine._outbuf[:] = sections[3]
+        machine._running = bool(flags & _SNAPSHOT_PAUSED)
+
+        return machine
+
+    def tape_view(self):
+        # read-only view of the touched cells without copying them; the tape cannot
+        # grow while the view is alive, so release it before running again
+        return memoryview(self._mem)[:self._mem_len].toreadonly()
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def cell_bits(self):
+        return self._cell_bits
+
+    @property
+    def overflow(self):
+        return 'wrap' if self._cell_mask >= 0 else 'error'
 
     @property
     def code(self):
@@ -191,7 +1939,11 @@ class BFMachine:
 
     @property
     def memory(self):
-        return bytes(self._mem)
+        # bytes for 8-bit cells, an array of the touched cells otherwise
+        if self._cell_bits == 8:
+            return bytes(memoryview(self._mem)[:self._mem_len])
+
+        return self._mem[:self._mem_len]
 
     @property
     def memory_pointer(self):
@@ -201,6 +1953,48 @@ class BFMachine:
     def pc(self):
         return self._pc
 
+    @property
+    def paused(self):
+        return self._running
+
+    @property
+    def profile(self):
+        # BFProfile of the last run made with profile=True
+        return self._profile
+
+    @staticmethod
+    def cache_info():
+        return _program_cache.info()
+
+    @staticmethod
+    def cache_clear():
+        _program_cache.clear()
+
+    @staticmethod
+    def configure_cache(*, maxsize=None, maxbytes=None):
+        for name, value in (('maxsize', maxsize), ('maxbytes', maxbytes)):
+            if value is not None:
+                if not isinstance(value, int):
+                    raise TypeError('%s should be an integer' % name)
+
+                if value < 0:
+                    raise ValueError('%s should be a non-negative integer' % name)
+
+        _program_cache.configure(maxsize, maxbytes)
+
+    @staticmethod
+    def analyze(code):
+        if not isinstance(code, (str, bytes)):
+            raise TypeError('code should be str or bytes')
+
+        if not code:
+            raise ValueError('code should not be empty')
+
+        if isinstance(code, str):
+            code = code.encode()
+
+        return BFAnalysis(_program_cache.get(code))
+
     @staticmethod
     def quine_test(code):
         if not isinstance(code, (str, bytes)):
@@ -214,7 +2008,8 @@ class BFMachine:
 
         return BFMachine(code).run() == code
 
-__all__ = ['BFMachine']
+__all__ = ['BFAnalysis', 'BFMachine', 'BFProfile', 'CacheInfo', 'InstructionStats', 'LoopAnalysis', 'LoopStats',
+           'OutputLimitExceeded']
 
 
 #if __name__ == '__main__':
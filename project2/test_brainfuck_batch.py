@@ -0,0 +1,54 @@
+import unittest
+from brainfuck_batch import TimeLimitExceeded, run_batch
+
+
+class TestRunBatch(unittest.TestCase):
+    code_echo = b',[.,]'
+    code_hello = b'++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-.<.+++.------.--------.>>+.>++.'
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(TypeError):
+            list(run_batch([], workers='many'))
+
+        with self.assertRaises(ValueError):
+            list(run_batch([], workers=0))
+
+        with self.assertRaises(ValueError):
+            list(run_batch([], timeout=-1))
+
+        with self.assertRaises(ValueError):
+            list(run_batch([], timeout=1, backend='pycompile'))
+
+    def test_empty(self):
+        self.assertEqual(list(run_batch([], workers=2)), [])
+
+    def test_results(self):
+        jobs = [(self.code_echo, str(i)) for i in range(20)] + [(self.code_hello, b'')]
+        results = sorted(run_batch(jobs, workers=2))
+
+        self.assertEqual([r.index for r in results], list(range(21)))
+        self.assertTrue(all(r.error is None for r in results))
+        self.assertEqual([r.output for r in results[:20]], [str(i).encode() for i in range(20)])
+        self.assertEqual(results[20].output, b'Hello World!\n')
+
+        results = sorted(run_batch(jobs, workers=2, backend='pycompile'))
+        self.assertEqual(results[20].output, b'Hello World!\n')
+
+    def test_errors(self):
+        jobs = [(b'+[]', b''), (b'<', b''), (b'[', b''), (self.code_echo, b'ok')]
+        results = sorted(run_batch(jobs, workers=2, cycle_limit=1000))
+
+        self.assertIsInstance(results[0].error, TimeoutError)
+        self.assertNotIsInstance(results[0].error, TimeLimitExceeded)
+        self.assertEqual(results[0].cycles, 1001)
+        self.assertIsInstance(results[1].error, IndexError)
+        self.assertIsInstance(results[2].error, SyntaxError)
+        self.assertEqual(results[3].output, b'ok')
+
+    def test_timeout(self):
+        results = list(run_batch([(b'+[]', b'')], workers=1, timeout=0.2))
+        self.assertIsInstance(results[0].error, TimeLimitExceeded)
+        self.assertIsNone(results[0].output)
+
+if __name__ == '__main__':  # pragma: no branch
+    unittest.main()
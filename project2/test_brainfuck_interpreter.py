@@ -1,5 +1,9 @@
+import json
+import asyncio
 import unittest
-from brainfuck_interpreter import BFMachine
+from array import array
+from io import BytesIO
+from brainfuck_interpreter import BFMachine, LoopAnalysis, OutputLimitExceeded
 
 
 class TestBFMachine(unittest.TestCase):
@@ -7,16 +11,21 @@ class TestBFMachine(unittest.TestCase):
     code_quine = b'->+>+++>>+>++>+>+++>>+>++>>>+>+>+>++>+>>>>+++>+>>++>+>+++>>++>++>>+>>+>++>++>+>>>>+++>+>>>>++>++>>>>+>>++>+>+++>>>++>>++++++>>+>>++>+>>>>+++>>+++++>>+>+++>>>++>>++>>+>>++>+>+++>>>++>>+++++++++++++>>+>>++>+>+++>+>+++>>>++>>++++>>+>>++>+>>>>+++>>+++++>>>>++>>>>+>+>++>>+++>+>>>>+++>+>>>>+++>+>>>>+++>>++>++>+>+++>+>++>++>>>>>>++>+>+++>>>>>+++>>>++>+>+++>+>+>++>>>>>>++>>>+>>>++>+>>>>+++>+>>>+>>++>+>++++++++++++++++++>>>>+>+>>>+>>++>+>+++>>>++>>++++++++>>+>>++>+>>>>+++>>++++++>>>+>++>>+++>+>+>++>+>+++>>>>>+++>>>+>+>>++>+>+++>>>++>>++++++++>>+>>++>+>>>>+++>>++++>>+>+++>>>>>>++>+>+++>>+>++>>>>+>+>++>+>>>>+++>>+++>>>+[[->>+<<]<+]+++++[->+++++++++<]>.[+]>>[<<+++++++[->+++++++++<]>-.------------------->-[-<.<+>>]<[+]<+>>>]<<<[-[-[-[>>+<++++++[->+++++<]]>++++++++++++++<]>+++<]++++++[->+++++++<]>+<<<-[->>>++<<<]>[->>.<<]<<]'
     code_no_loop = b'++++++++>->-->--->----<<'
     code_loop = b'+++[-]'
+    backend = 'interpreter' # used by machine() unless a test asks for another one
+
+    def machine(self, *args, **kwargs):
+        kwargs.setdefault('backend', self.backend)
+        return BFMachine(*args, **kwargs)
 
     def test_init(self):
-        m = BFMachine()
+        m = self.machine()
         self.assertIsNone(m.code)
         self.assertEqual(m.cycles, 0)
         self.assertEqual(m.memory, b'\x00')
         self.assertEqual(m.memory_pointer, 0)
         self.assertEqual(m.pc, 0)
 
-        m = BFMachine(b'+[+]')
+        m = self.machine(b'+[+]')
         self.assertEqual(m.code, b'+[+]')
         self.assertEqual(m.cycles, 0)
         self.assertEqual(m.memory, b'\x00')
@@ -24,7 +33,7 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.pc, 0)
 
     def test_load_code(self):
-        m = BFMachine()
+        m = self.machine()
 
         with self.assertRaises(TypeError):
             m.load_code(0)
@@ -39,7 +48,7 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.code, b'--')
 
     def test_reset_mem(self):
-        m = BFMachine(b'+++')  # modifies mem first
+        m = self.machine(b'+++')  # modifies mem first
         m.run()
         m.reset_mem()
         self.assertEqual(m.memory, b'\x00')
@@ -56,60 +65,60 @@ class TestBFMachine(unittest.TestCase):
         self.assertTrue(BFMachine.quine_test(self.code_quine.decode()))
 
     def test_hello_world(self):
-        m = BFMachine(self.code_hello)
+        m = self.machine(self.code_hello)
         out = m.run()
         self.assertEqual(out, b'Hello World!\n')
 
     def test_property_code(self):
-        m = BFMachine(self.code_hello)
+        m = self.machine(self.code_hello)
         self.assertEqual(m.code, self.code_hello)
 
     def test_property_cycles(self):
-        m = BFMachine(self.code_no_loop)
+        m = self.machine(self.code_no_loop)
         self.assertEqual(m.cycles, 0)
         m.run()
         self.assertEqual(m.cycles, len(self.code_no_loop))
 
     def test_property_memory(self):
-        m = BFMachine(self.code_no_loop)
+        m = self.machine(self.code_no_loop)
         self.assertEqual(m.memory, b'\x00')
         m.run()
         self.assertEqual(m.memory, b'\x08\xff\xfe\xfd\xfc')
 
     def test_property_memory_pointer(self):
-        m = BFMachine(self.code_no_loop)
+        m = self.machine(self.code_no_loop)
         self.assertEqual(m.memory_pointer, 0)
         m.run()
         self.assertEqual(m.memory_pointer, 2)
 
     def test_property_pc(self):
-        m = BFMachine(self.code_no_loop)
+        m = self.machine(self.code_no_loop)
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, len(self.code_no_loop))
 
-        m = BFMachine(self.code_loop)
+        m = self.machine(self.code_loop)
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, len(self.code_loop))
 
     def test_init_invalid_code(self):
         with self.assertRaises(TypeError):
-            m = BFMachine(666)
+            m = self.machine(666)
 
     def test_run_with_invalid_input(self):
-        m = BFMachine(b',.')
+        m = self.machine(b',.')
 
         with self.assertRaises(TypeError):
             m.run(1)
 
     def test_run_without_code(self):
-        m = BFMachine()
+        m = self.machine()
         with self.assertRaises(ValueError):
             m.run()
 
     def test_input(self):
-        m = BFMachine(b',>,')
+        m = self.machine(b',>,')
         self.assertEqual(m.pc, 0)
         m.run(b'\xcc\xdd')
         self.assertEqual(m.pc, 3)
@@ -122,7 +131,7 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.memory, b'he')
 
     def test_halt(self):
-        m = BFMachine(b'+!+')
+        m = self.machine(b'+!+')
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, 1)
@@ -130,14 +139,14 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.memory, b'\x01')
 
     def test_whitespace(self):
-        m = BFMachine(b'   .')
+        m = self.machine(b'   .')
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, 4)
         self.assertEqual(m.memory_pointer, 0)
         self.assertEqual(m.memory, b'\x00')
 
-        m = BFMachine(b'   ') # purely whitespace
+        m = self.machine(b'   ') # purely whitespace
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, 3)
@@ -145,14 +154,14 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.memory, b'\x00')
 
     def test_comment(self):
-        m = BFMachine(b'#+\n')
+        m = self.machine(b'#+\n')
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, 3)
         self.assertEqual(m.memory_pointer, 0)
         self.assertEqual(m.memory, b'\x00')
 
-        m = BFMachine(b'#+') # no '\n' to terminate the comment
+        m = self.machine(b'#+') # no '\n' to terminate the comment
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.pc, 2)
@@ -160,34 +169,48 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.memory, b'\x00')
 
     def test_invalid_opcode(self):
-        m = BFMachine(b'+@+')
-        self.assertEqual(m.pc, 0)
-
         with self.assertRaises(SyntaxError):
-            m.run()
+            self.machine(b'+@+')
+
+        with self.assertRaisesRegex(SyntaxError, r"b'@' at position 8 \(line 2, column 3\)"):
+            self.machine(b'+ # @\n++@+')
+
+        m = self.machine(b'+ # @\n++ +')
+        m.run()
+        self.assertEqual(m.memory, b'\x04')
 
     def test_index_error(self):
-        m = BFMachine(b'<.')
+        m = self.machine(b'<.')
         self.assertEqual(m.pc, 0)
 
         with self.assertRaises(IndexError):
             m.run()
 
     def test_unmatched_left_bracket(self):
-        m = BFMachine(b'[')
-        self.assertEqual(m.pc, 0)
         with self.assertRaises(SyntaxError):
-            m.run()
+            self.machine(b'[')
+
+        with self.assertRaises(SyntaxError):
+            self.machine(b'[[]')
 
     def test_unmatched_right_bracket(self):
-        m = BFMachine(b'-]') # note that an extra '-' is added to force interpreter to complain
-        self.assertEqual(m.pc, 0)
+        with self.assertRaises(SyntaxError):
+            self.machine(b'-]')
 
         with self.assertRaises(SyntaxError):
-            m.run()
+            self.machine(b'[]]')
+
+    def test_brackets_in_comment(self):
+        m = self.machine(b'+# ignore [ and ]]\n[-]')
+        m.run()
+        self.assertEqual(m.memory, b'\x00')
+        self.assertEqual(m.cycles, 4)
+
+        with self.assertRaises(SyntaxError):
+            self.machine(b'[# ]\n')
 
     def test_cycle_limit(self):
-        m = BFMachine(b'+[+]')
+        m = self.machine(b'+[+]')
         self.assertEqual(m.pc, 0)
 
         with self.assertRaises(TypeError):
@@ -204,13 +227,744 @@ class TestBFMachine(unittest.TestCase):
         self.assertEqual(m.memory, b'\x00')
         self.assertEqual(m.memory_pointer, 0)
 
+    def test_cycle_limit_folded(self):
+        m = self.machine(b'+++ ++>>>')
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=3)
+        self.assertEqual(m.cycles, 4)
+        self.assertEqual(m.memory, b'\x04')
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=6)
+        self.assertEqual(m.cycles, 7)
+        self.assertEqual(m.memory, b'\x05\x00\x00')
+        self.assertEqual(m.memory_pointer, 2)
+
+        m.run(cycle_limit=8)
+        self.assertEqual(m.cycles, 8)
+
+    def test_cycle_limit_block(self):
+        m = self.machine(b'++[>+++>++<<-]>>+.')
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=5)
+        self.assertEqual(m.cycles, 6)
+        self.assertEqual(m.memory, b'\x02\x02')
+        self.assertEqual(m.memory_pointer, 1)
+        self.assertEqual(m.pc, 6)
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=12)
+        self.assertEqual(m.cycles, 13)
+        self.assertEqual(m.memory, b'\x01\x03\x02')
+        self.assertEqual(m.pc, 13)
+
+        m = self.machine(b'+[>+<-]>>>+<<<<<+')
+
+        with self.assertRaises(IndexError):
+            m.run()
+        self.assertEqual(m.cycles, 14)
+        self.assertEqual(m.memory, b'\x00\x01\x00\x01')
+        self.assertEqual(m.pc, 14)
+
+    def test_compile(self):
+        with self.assertRaises(ValueError):
+            self.machine().compile()
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(self.code_hello, backend=backend)
+            m.compile()
+            self.assertEqual(m.run(), b'Hello World!\n')
+
+    def test_index_error_folded(self):
+        m = self.machine(b'>><<<<')
+
+        with self.assertRaises(IndexError):
+            m.run()
+        self.assertEqual(m.cycles, 4)
+        self.assertEqual(m.memory_pointer, 0)
+        self.assertEqual(m.pc, 4)
+
+        m = self.machine(b'+>><<<<')
+
+        with self.assertRaises(IndexError):
+            m.run()
+        self.assertEqual(m.pc, 5)
+
+        m = self.machine(b'++ +++')
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=3)
+        self.assertEqual(m.cycles, 4)
+        self.assertEqual(m.pc, 5)
+
+        m = self.machine(b'>>>>', memory_limit=3)
+
+        with self.assertRaises(MemoryError):
+            m.run()
+        self.assertEqual(m.pc, 2)
+
+        m = self.machine(b'+' * 300, overflow='error')
+
+        with self.assertRaises(OverflowError):
+            m.run()
+        self.assertEqual(m.pc, 255)
+
+    def test_idiom_loops(self):
+        m = self.machine(b'+++++[->++>+++<<]>>[>]<[<]+++[-]')
+        m.run()
+        self.assertEqual(m.memory, b'\x00\x0a\x0f\x00')
+        self.assertEqual(m.memory_pointer, 0)
+        self.assertEqual(m.cycles, 82)
+
+        m = self.machine(b'-[+]+[<]') # scans off the left end of the tape
+        with self.assertRaises(IndexError):
+            m.run()
+        self.assertEqual(m.cycles, 6)
+
+    def test_idiom_loops_cycle_limit(self):
+        m = self.machine(b'+++++[->+<]')
+
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=20)
+        self.assertEqual(m.cycles, 21)
+        self.assertEqual(m.memory, b'\x02\x03')
+
+        m.run(cycle_limit=31)
+        self.assertEqual(m.cycles, 31)
+        self.assertEqual(m.memory, b'\x00\x05')
+
+    def test_backend(self):
+        with self.assertRaises(ValueError):
+            BFMachine(self.code_hello, backend='awesome')
+
+        self.assertEqual(BFMachine().backend, 'interpreter')
+        self.assertEqual(BFMachine(backend='pycompile').backend, 'pycompile')
+
+    def test_pycompile_backend(self):
+        for code in (self.code_hello, self.code_quine, self.code_no_loop, b',[.,]+[<]'):
+            m1 = self.machine(code)
+            m2 = self.machine(code, backend='pycompile')
+
+            try:
+                out1 = m1.run(b'abc')
+            except IndexError:
+                with self.assertRaises(IndexError):
+                    m2.run(b'abc')
+            else:
+                self.assertEqual(m2.run(b'abc'), out1)
+                self.assertEqual(m2.cycles, m1.cycles)
+                self.assertEqual(m2.memory, m1.memory)
+                self.assertEqual(m2.memory_pointer, m1.memory_pointer)
+                self.assertEqual(m2.pc, m1.pc)
+
+        m = self.machine(b'+[+]', backend='pycompile')
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=100)
+
+        # the limit runs out within the run of moves that fails, or before a failing idiom
+        for code, limit in ((b'>>><<<<', 4), (b'->>>>', 2), (b'++++++++[<<]', 8)):
+            m = self.machine(code, backend='pycompile', memory_size=4, memory_limit=4)
+            with self.assertRaises(TimeoutError):
+                m.run(cycle_limit=limit)
+
+        for code in (b'>>><<<<', b'->>>>', b'+>+[<<]', b'+[->>>>+<<<<]'):
+            m1 = self.machine(code, memory_size=4, memory_limit=4)
+            m2 = self.machine(code, backend='pycompile', memory_size=4, memory_limit=4)
+
+            with self.assertRaises((IndexError, MemoryError)) as cm:
+                m1.run()
+            with self.assertRaises(type(cm.exception)):
+                m2.run()
+            self.assertEqual(m2.cycles, m1.cycles)
+            self.assertEqual(m2.memory, m1.memory)
+
+        m = self.machine(b'+!+', backend='pycompile')
+        m.run()
+        self.assertEqual(m.pc, 1)
+        self.assertEqual(m.memory, b'\x01')
+
+        m = self.machine(b'+' + b'[' * 100 + b'-' + b']' * 100, backend='pycompile') # too deep for Python
+        m.run()
+        self.assertEqual(m.memory, b'\x00')
+
+    def test_bytecode_backend(self):
+        for code in (self.code_hello, self.code_quine, self.code_no_loop, b',[.,]+[<]', b'+[>+]', b'++!+'):
+            for cycle_limit in (None, 50, 1000):
+                m1 = self.machine(code, memory_limit=100)
+                m2 = self.machine(code, backend='bytecode', memory_limit=100)
+                results = []
+
+                for m in (m1, m2):
+                    try:
+                        results.append(m.run(b'abc', cycle_limit=cycle_limit))
+                    except Exception as e:
+                        results.append(type(e))
+
+                self.assertEqual(results[1], results[0])
+                self.assertEqual(m2.cycles, m1.cycles)
+                self.assertEqual(m2.memory, m1.memory)
+                self.assertEqual(m2.memory_pointer, m1.memory_pointer)
+                self.assertEqual(m2.pc, m1.pc)
+                self.assertFalse(m2.paused)
+
+    def test_memory_size(self):
+        with self.assertRaises(TypeError):
+            self.machine(memory_size='big')
+
+        with self.assertRaises(ValueError):
+            self.machine(memory_size=0)
+
+        with self.assertRaises(TypeError):
+            self.machine(memory_limit=1.5)
+
+        with self.assertRaises(ValueError):
+            self.machine(memory_limit=0)
+
+        with self.assertRaises(ValueError):
+            self.machine(memory_size=16, memory_limit=8)
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(b'++++[>++<-]>>>>>+', backend=backend, memory_size=1)
+            m.run()
+            self.assertEqual(m.memory, b'\x00\x08\x00\x00\x00\x01')
+            self.assertEqual(m.memory_pointer, 5)
+
+    def test_memory_limit(self):
+        m = self.machine(b'>>>>>', memory_size=2, memory_limit=3)
+
+        with self.assertRaises(MemoryError):
+            m.run()
+        self.assertEqual(m.cycles, 2)
+        self.assertEqual(m.memory_pointer, 2)
+        self.assertEqual(m.memory, b'\x00\x00\x00')
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(b'+[>+]', backend=backend, memory_limit=100)
+            with self.assertRaises(MemoryError):
+                m.run()
+            self.assertEqual(len(m.memory), 100)
+
+    def test_cell_bits(self):
+        with self.assertRaises(ValueError):
+            self.machine(cell_bits=12)
+
+        with self.assertRaises(ValueError):
+            self.machine(overflow='saturate')
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(b'-.>+++[->+++++<]>[-<<+>>]<<[->>+>+<<<]', backend=backend, cell_bits=16)
+            self.assertEqual(m.run(), b'\xff')
+            self.assertEqual(m.cell_bits, 16)
+            self.assertEqual(m.memory, array('H', [0, 0, 14, 14]))
+            self.assertEqual(m.cycles, 284)
+
+            m = self.machine(b'-[-]', backend=backend, cell_bits=32)
+            m.run()
+            self.assertEqual(m.cycles, 2 + 2 * 0xffffffff)
+            self.assertEqual(m.memory, array(m.memory.typecode, [0]))
+
+        m = self.machine(b'-[>+<-]>[>+++++<-]', cell_bits=16)
+        self.assertEqual(m.run_many([b''] * 3), [b''] * 3)
+        m.run(cycle_limit=10000000)
+        self.assertEqual(m.memory, array('H', [0, 0, 0xfffb]))
+
+        m2 = BFMachine.restore(m.snapshot())
+        self.assertEqual(m2.cell_bits, 16)
+        self.assertEqual(m2.memory, m.memory)
+
+    def test_overflow_error(self):
+        m = self.machine(b'+' * 300, overflow='error')
+        self.assertEqual(m.overflow, 'error')
+
+        with self.assertRaises(OverflowError) as context:
+            m.run()
+        self.assertNotIsInstance(context.exception, OutputLimitExceeded)
+        self.assertEqual(m.cycles, 255)
+        self.assertEqual(m.memory, b'\xff')
+
+        m = self.machine(b'+++-----', overflow='error', cell_bits=16)
+        with self.assertRaises(OverflowError):
+            m.run()
+        self.assertEqual(m.cycles, 6)
+        self.assertEqual(m.memory, array('H', [0]))
+
+        m = self.machine(b'++[+]', overflow='error', backend='pycompile')
+        with self.assertRaises(OverflowError):
+            m.run()
+        self.assertEqual(m.cycles, 3 + 253 * 2)
+
+        m = self.machine(b'++++[->++++++++<]>[->++++++++<]', overflow='error')
+        with self.assertRaises(OverflowError):
+            m.run()
+        self.assertEqual(m.memory, b'\x00\x00\xff')
+
+        m = self.machine(b'++++[->++++++++<]>[->++++++++<]', overflow='error', cell_bits=16)
+        m.run()
+        self.assertEqual(m.memory, array('H', [0, 0, 256]))
+
+        m = self.machine(b'-', overflow='error')
+        self.assertIsInstance(m.run_many([b'', b''], return_exceptions=True)[1], OverflowError)
+
+        m2 = BFMachine.restore(m.snapshot())
+        self.assertEqual(m2.overflow, 'error')
+
+    def test_run_stream(self):
+        m = self.machine(b',[.,]')
+
+        with self.assertRaises(TypeError):
+            m.run_stream(BytesIO(), None)
+
+        with self.assertRaises(TypeError):
+            m.run_stream(1, BytesIO())
+
+        with self.assertRaises(ValueError):
+            m.run_stream(None, BytesIO(), buffer_size=0)
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(b',[.,]', backend=backend)
+            fout = BytesIO()
+            m.run_stream(BytesIO(b'hello world'), fout, buffer_size=4)
+            self.assertEqual(fout.getvalue(), b'hello world')
+
+            fout = BytesIO()
+            m.run_stream([b'ab', b'', bytearray(b'cd')], fout)
+            self.assertEqual(fout.getvalue(), b'abcd')
+
+            fout = BytesIO()
+            self.machine(self.code_hello, backend=backend).run_stream(None, fout)
+            self.assertEqual(fout.getvalue(), b'Hello World!\n')
+
+    def test_run_stream_incremental(self):
+        writes = []
+
+        class Output:
+            def write(self, data):
+                writes.append(data)
+
+        def chunks():
+            yield b'abc'
+            self.assertEqual(writes, [b'abc']) # echoed before more input is read
+            yield b'def'
+
+        m = self.machine(b',[.,]')
+        m.run_stream(chunks(), Output(), buffer_size=100)
+        self.assertEqual(writes, [b'abc', b'def'])
+
+        del writes[:]
+        m = self.machine(b'+++++[.-]')
+        m.run_stream(None, Output(), buffer_size=2)
+        self.assertEqual(writes, [b'\x05\x04', b'\x03\x02', b'\x01'])
+
+    def test_arun(self):
+        class Writer:
+            def __init__(self):
+                self.data = bytearray()
+                self.drains = 0
+
+            def write(self, data):
+                self.data += data
+
+            async def drain(self):
+                self.drains += 1
+
+        async def echo():
+            reader = asyncio.StreamReader()
+            writer = Writer()
+            task = asyncio.ensure_future(self.machine(b',[.,]').arun(reader, writer))
+            reader.feed_data(b'ab')
+            await asyncio.sleep(0.01)
+            self.assertEqual(writer.data, b'ab') # echoed while waiting for more input
+            self.assertFalse(task.done())
+            reader.feed_data(b'c')
+            reader.feed_eof()
+            await task
+            self.assertEqual(writer.data, b'abc')
+            self.assertGreater(writer.drains, 0)
+
+        async def interleave():
+            # a busy program does not keep another session from running
+            m1 = self.machine(self.code_quine)
+            m2 = self.machine(self.code_hello)
+            writer1, writer2 = Writer(), Writer()
+            task = asyncio.ensure_future(m1.arun(None, writer1, slice_cycles=1000))
+            await m2.arun(None, writer2, slice_cycles=1000)
+            self.assertFalse(task.done())
+            self.assertEqual(writer2.data, b'Hello World!\n')
+            await task
+            self.assertEqual(writer1.data, self.code_quine)
+
+        async def limit():
+            m = self.machine(b'+.[+]')
+            writer = Writer()
+
+            with self.assertRaises(TimeoutError):
+                await m.arun(None, writer, cycle_limit=100, slice_cycles=30)
+            self.assertEqual(m.cycles, 101)
+            self.assertEqual(writer.data, b'\x01')
+
+            with self.assertRaises(ValueError):
+                await m.arun(None, writer, slice_cycles=0)
+
+        asyncio.run(echo())
+        asyncio.run(interleave())
+        asyncio.run(limit())
+
+    def test_output_run(self):
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(b'+++...>.. .', backend=backend)
+            self.assertEqual(m.run(), b'\x03\x03\x03\x00\x00\x00')
+            self.assertEqual(m.cycles, 10)
+
+        for backend in ('interpreter', 'bytecode'):
+            m = self.machine(b'+++...>.. .', backend=backend)
+            with self.assertRaises(TimeoutError):
+                m.run(cycle_limit=4)
+            self.assertEqual(m.cycles, 5)
+
+    def test_max_output(self):
+        with self.assertRaises(TypeError):
+            self.machine(b'.', max_output='awesome')
+
+        with self.assertRaises(ValueError):
+            self.machine(b'.', max_output=-1)
+
+        for backend in ('interpreter', 'pycompile', 'bytecode'):
+            m = self.machine(self.code_hello, backend=backend, max_output=13)
+            self.assertEqual(m.run(), b'Hello World!\n')
+
+            m = self.machine(self.code_hello, backend=backend, max_output=5)
+            with self.assertRaises(OutputLimitExceeded):
+                m.run()
+            self.assertEqual(m.pc, 72)
+
+            # the cycle limit is hit first
+            m2 = self.machine(b'+[+].', backend=backend, max_output=0)
+            with self.assertRaises(TimeoutError):
+                m2.run(cycle_limit=10)
+
+            m2 = self.machine(b'+++.....', backend=backend, max_output=3)
+            with self.assertRaises(TimeoutError):
+                m2.run(cycle_limit=5)
+            with self.assertRaises(OutputLimitExceeded):
+                m2.run(cycle_limit=6)
+            self.assertEqual(m2.cycles, 7)
+
+            fout = BytesIO()
+            with self.assertRaises(OverflowError):
+                m.run_stream(None, fout, buffer_size=2)
+            self.assertEqual(fout.getvalue(), b'Hello')
+
+        m = self.machine(b'+[...]', max_output=7)
+        with self.assertRaises(OverflowError):
+            list(m.run_iter(slice_cycles=2))
+        self.assertEqual(m.cycles, 13) # the whole '...' run is written at once
+
+        m = self.machine(b',[.,]', max_output=3)
+        results = m.run_many([b'ab', b'abc', b'abcd'], return_exceptions=True)
+        self.assertEqual(results[:2], [b'ab', b'abc'])
+        self.assertIsInstance(results[2], OverflowError)
+
+    def test_resume(self):
+        m = self.machine(self.code_hello)
+        self.assertFalse(m.paused)
+
+        with self.assertRaises(ValueError):
+            m.resume()
+
+        m.start()
+        self.assertTrue(m.paused)
+
+        with self.assertRaises(TypeError):
+            m.resume('awesome')
+
+        with self.assertRaises(ValueError):
+            m.resume(0)
+
+        out = m.resume(100)
+        self.assertTrue(m.paused)
+        self.assertGreaterEqual(m.cycles, 100)
+        self.assertLess(m.cycles, 200)
+
+        out += m.resume()
+        self.assertFalse(m.paused)
+        self.assertEqual(out, b'Hello World!\n')
+
+        ref = self.machine(self.code_hello)
+        ref.run()
+        self.assertEqual(m.cycles, ref.cycles)
+        self.assertEqual(m.memory, ref.memory)
+
+    def test_run_iter(self):
+        m = self.machine(b',[.,]')
+        chunks = list(m.run_iter(b'abc', pause_on_output=True))
+        self.assertEqual(chunks, [b'a', b'b', b'c', b''])
+        self.assertEqual(m.pc, 5)
+
+        m = self.machine(self.code_quine)
+        chunks = list(m.run_iter(slice_cycles=1000))
+        self.assertEqual(b''.join(chunks), self.code_quine)
+        self.assertGreater(len(chunks), 100)
+
+        m = self.machine(b'+[+]')
+        with self.assertRaises(TimeoutError):
+            list(m.run_iter(cycle_limit=100, slice_cycles=30))
+        self.assertEqual(m.cycles, 101)
+        self.assertFalse(m.paused)
+
+    def test_run_many(self):
+        m = self.machine()
+        with self.assertRaises(ValueError):
+            m.run_many([b''])
+
+        m = self.machine(b',[.,]')
+        with self.assertRaises(TypeError):
+            m.run_many([b'', 0])
+        with self.assertRaises(ValueError):
+            m.run_many([b''], cycle_limit=0)
+
+        self.assertEqual(m.run_many([]), [])
+        self.assertEqual(m.run_many(['abc']), [b'abc'])
+
+        inputs = [b'', b'a', b'abc', b'ab\x00c', 'xyz'] * 10
+        expected = [m.run(input_) for input_ in inputs]
+        m.run(b'a')
+        self.assertEqual(m.run_many(inputs), expected)
+        self.assertEqual(m.cycles, 5)
+
+        m = self.machine(b',>,<[->+<]>.[>]<<[-]')
+        inputs = [bytes([i, 255 - i]) for i in range(256)]
+        self.assertEqual(m.run_many(inputs), [b'\xff'] * 256)
+
+        m = self.machine(b',[->+<]>[-<<]')
+        with self.assertRaises(IndexError):
+            m.run_many([b'\x00', b'\x01'])
+
+        results = m.run_many([b'\x00', b'\x01', b''], return_exceptions=True)
+        self.assertEqual(results[0], b'')
+        self.assertIsInstance(results[1], IndexError)
+        self.assertEqual(results[2], b'')
+
+        m = self.machine(b',[>+++++<-]>[-].')
+        results = m.run_many([b'\x01', b'\x05', b'\x06', b'\xff'], cycle_limit=100, return_exceptions=True)
+        self.assertEqual(results[:2], [b'\x00', b'\x00'])
+        self.assertIsInstance(results[2], TimeoutError)
+        self.assertIsInstance(results[3], TimeoutError)
+
+        m = self.machine(self.code_hello, memory_limit=5)
+        for result in m.run_many([b''] * 3, return_exceptions=True):
+            self.assertIsInstance(result, MemoryError)
+
+        self.assertEqual(self.machine(self.code_quine).run_many([b''] * 3), [self.code_quine] * 3)
+
+        m = self.machine(b',[.-' + b'>' * 100 + b'+' + b'<' * 100 + b']' + b'>' * 100 + b'.') # lanes leave one by one
+        inputs = [bytes([i]) for i in range(40)]
+        self.assertEqual(m.run_many(inputs), [m.run(input_) for input_ in inputs])
+
+    def test_snapshot(self):
+        m = self.machine()
+        with self.assertRaises(ValueError):
+            m.snapshot()
+
+        m = self.machine(self.code_quine)
+        m.start(cycle_limit=10000000)
+        output = m.resume(5000)
+        data = m.snapshot()
+
+        m2 = BFMachine.restore(data)
+        self.assertTrue(m2.paused)
+        self.assertEqual((m2.code, m2.memory, m2.memory_pointer, m2.pc, m2.cycles),
+                         (m.code, m.memory, m.memory_pointer, m.pc, m.cycles))
+        self.assertEqual(output + m2.resume(), self.code_quine)
+        self.assertEqual(m.resume(), self.code_quine[len(output):])
+        self.assertEqual(m2.cycles, m.cycles)
+
+        m = self.machine(b',[.,]', backend='pycompile', memory_limit=100)
+        m.start(b'hello')
+        output = m.resume(6)
+        data = m.snapshot(include_code=False)
+        self.assertLess(len(data), len(m.snapshot()))
+
+        with self.assertRaises(ValueError):
+            BFMachine.restore(data)
+
+        with self.assertRaises(ValueError):
+            BFMachine.restore(data, b',[.,]+')
+
+        m2 = BFMachine.restore(bytearray(data), ',[.,]')
+        self.assertEqual(m2.backend, 'pycompile')
+        self.assertEqual(output + m2.resume(), b'hello')
+        self.assertFalse(m2.paused)
+
+        m = self.machine(b'+>++>+++')
+        m.run()
+        m2 = BFMachine.restore(m.snapshot())
+        self.assertFalse(m2.paused)
+        self.assertEqual(m2.memory, b'\x01\x02\x03')
+        self.assertEqual(m2.run(reset_mem=False), b'')
+        self.assertEqual(m2.memory, b'\x01\x02\x04\x02\x03')
+
+        m = self.machine(b'+[.]', max_output=5)
+        m.start(cycle_limit=1000000)
+        self.assertEqual(m.resume(4), b'\x01')
+        m2 = BFMachine.restore(m.snapshot())
+        with self.assertRaises(OverflowError):
+            m2.resume()
+        self.assertEqual(m2.cycles, 13)
+
+        with self.assertRaises(TypeError):
+            BFMachine.restore('snapshot')
+
+        with self.assertRaises(ValueError):
+            BFMachine.restore(b'snapshot')
+
+        with self.assertRaises(ValueError):
+            BFMachine.restore(m.snapshot()[:-1])
+
+    def test_tape_view(self):
+        m = self.machine(b'+>++>+++<')
+        m.run()
+
+        with m.tape_view() as view:
+            self.assertEqual(view.tolist(), [1, 2, 3])
+            self.assertTrue(view.readonly)
+
+        m.reset_mem()
+        self.assertEqual(m.tape_view().tobytes(), b'\x00')
+
+    def test_analyze(self):
+        with self.assertRaises(TypeError):
+            BFMachine.analyze(None)
+
+        with self.assertRaises(ValueError):
+            BFMachine.analyze('')
+
+        with self.assertRaises(SyntaxError):
+            BFMachine.analyze('[')
+
+        a = BFMachine.analyze(b'++[->+>,<<]>>>')
+        self.assertEqual((a.min_offset, a.max_offset, a.memory_size), (0, 3, 4))
+        self.assertTrue(a.terminates)
+        self.assertEqual(a.loops, [LoopAnalysis(2, 10, 0, 0, 0, 2, 'terminates')])
+
+        a = BFMachine.analyze(self.code_hello)
+        self.assertIsNone(a.memory_size)
+        self.assertFalse(a.terminates)
+        self.assertEqual([loop.start for loop in a.loops], [8, 14, 43])
+        self.assertEqual([loop.depth for loop in a.loops], [0, 1, 1])
+        self.assertEqual([loop.pointer_delta for loop in a.loops], [None, 0, -1])
+        self.assertEqual([loop.termination for loop in a.loops], ['unknown', 'terminates', 'unknown'])
+        self.assertEqual(a.loops[1][4:6], (0, 4))
+
+        a = BFMachine.analyze('<+[]>')
+        self.assertEqual((a.min_offset, a.max_offset), (-1, 0))
+        self.assertEqual(a.loops[0].termination, 'infinite')
+
+        self.assertEqual(BFMachine.analyze('+[--]').loops[0].termination, 'unknown')
+        self.assertEqual(BFMachine.analyze('+[-!]').loops[0].termination, 'unknown')
+        self.assertEqual(BFMachine.analyze('+[,-]').loops[0].termination, 'unknown')
+        self.assertEqual(BFMachine.analyze('+[>[-]<[-]]').loops[0].termination, 'unknown')
+        self.assertEqual(BFMachine.analyze('+[>[-]<---]').loops[0].termination, 'terminates')
+
+        code = b'++++[>+++++<-]>[>++<-]>.'
+        m = self.machine(code, memory_size=BFMachine.analyze(code).memory_size)
+        m.run()
+        self.assertEqual(m.memory, b'\x00\x00\x28')
+
+    def test_program_cache(self):
+        with self.assertRaises(TypeError):
+            BFMachine.configure_cache(maxsize='all')
+
+        with self.assertRaises(ValueError):
+            BFMachine.configure_cache(maxbytes=-1)
+
+        info = BFMachine.cache_info()
+        self.addCleanup(BFMachine.configure_cache, maxsize=info.maxsize, maxbytes=info.maxbytes)
+        BFMachine.cache_clear()
+
+        self.machine(self.code_hello)
+        self.machine(self.code_hello).run()
+        self.assertTrue(BFMachine.quine_test(self.code_quine))
+        self.assertTrue(BFMachine.quine_test(self.code_quine))
+
+        info = BFMachine.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 2, 2))
+        self.assertGreater(info.currbytes, len(self.code_hello) + len(self.code_quine)) # compiled ops count too
+
+        BFMachine.configure_cache(maxsize=1)
+        self.assertEqual(BFMachine.cache_info().currsize, 1)
+        self.machine(self.code_quine) # most recently used entry is kept
+        self.assertEqual(BFMachine.cache_info().hits, 3)
+
+        BFMachine.cache_clear()
+        self.machine(self.code_hello)
+        size = BFMachine.cache_info().currbytes
+        self.machine(self.code_hello, backend='bytecode').run()
+        self.assertGreater(BFMachine.cache_info().currbytes, size)
+
+        BFMachine.configure_cache(maxsize=10, maxbytes=size)
+        self.assertEqual(BFMachine.cache_info().currsize, 0)
+        self.machine(self.code_hello)
+        self.machine(self.code_no_loop)
+        info = BFMachine.cache_info()
+        self.assertEqual(info.currsize, 1)
+        self.assertLessEqual(info.currbytes, size)
+
+        BFMachine.cache_clear()
+        self.assertEqual(BFMachine.cache_info()[:4], (0, 0, 10, 0))
+
+    def test_profile(self):
+        m = self.machine(b'++[>.<-]+++[->+<]')
+        m.run()
+        self.assertIsNone(m.profile)
+
+        m.run(profile=True)
+        profile = m.profile
+        self.assertEqual(profile.cycles, m.cycles)
+        self.assertEqual(sum(stats.cycles for stats in profile.instructions), m.cycles)
+        self.assertAlmostEqual(profile.time, profile.compute_time + profile.io_time)
+
+        self.assertEqual(profile.loops, [
+            (11, 16, 0, 1, 3, 16),
+            (2, 7, 0, 1, 2, 11),
+        ])
+        self.assertEqual(profile.instructions[0][:4], (11, 'multiply', 1, 16))
+        self.assertIn((4, '.', 2, 2), [stats[:4] for stats in profile.instructions])
+
+        tree = json.loads(profile.to_json())
+        self.assertEqual(tree['value'], m.cycles)
+        self.assertEqual([child['value'] for child in tree['children']], [11, 16])
+        self.assertIn('hot loops', profile.report())
+
+        m = self.machine(b'+[>+]')
+        with self.assertRaises(TimeoutError):
+            m.run(cycle_limit=1000, profile=True)
+        self.assertEqual(m.profile.cycles, 1001)
+
+        for code in (b' \n', b'# comment'): # no ops at all
+            m = self.machine(code)
+            self.assertEqual(m.run(profile=True), b'')
+            self.assertEqual(m.profile.cycles, 0)
+            self.assertEqual(m.profile.instructions, [])
+
     def test_run_without_reset_mem(self):
-        m = BFMachine(b'+')
+        m = self.machine(b'+')
         self.assertEqual(m.pc, 0)
         m.run()
         self.assertEqual(m.memory, b'\x01')
         m.run(reset_mem=False)
         self.assertEqual(m.memory, b'\x02')
 
+
+class TestBFMachineBytecode(TestBFMachine):
+    # the whole suite again, on the bytecode backend
+    backend = 'bytecode'
+
+    def test_backend(self):
+        self.assertEqual(self.machine().backend, 'bytecode')
+        self.assertEqual(self.machine(backend='interpreter').backend, 'interpreter')
+
+
 if __name__ == '__main__':  # pragma: no branch
     unittest.main()